@@ -1,15 +1,38 @@
-from . import _lib
-from .core import Handler, Parameter, ParameterWithPath, Literal, AllArguments  # noqa: F401
-from .core import ConditionalType, DefaultFactory, WithArgumentName, ForwardParameters  # noqa: F401
-from .core import FunctionConditionalType  # noqa: F401
-from ._lib import register_handler  # noqa: F401
-from .argparse import add_argparse_arguments  # noqa: F401
-from . import _handlers  # noqa: F401
-
 __all__ = ['Handler', 'Parameter', 'ParameterWithPath', 'Literal',
            'AllArguments', 'ConditionalType', 'register_handler',
-           'WithArgumentName', 'add_argparse_arguments']
+           'WithArgumentName', 'add_argparse_arguments', 'instrument']
 
 __version__ = "develop"
-del _lib
-del _handlers
+
+# Public names are resolved lazily, so that "import aparse" does not
+# import any of the backends (argparse, click) until they are used.
+_exports = {
+    'Handler': 'core',
+    'Parameter': 'core',
+    'ParameterWithPath': 'core',
+    'ParameterPlan': 'core',
+    'Literal': 'core',
+    'AllArguments': 'core',
+    'ConditionalType': 'core',
+    'DefaultFactory': 'core',
+    'WithArgumentName': 'core',
+    'ForwardParameters': 'core',
+    'FunctionConditionalType': 'core',
+    'register_handler': '_lib',
+    'add_argparse_arguments': 'argparse',
+    'instrument': '_instrument',
+}
+
+
+def __getattr__(name):
+    module_name = _exports.get(name)
+    if module_name is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    # __import__ (unlike importlib) is accounted for by -X importtime
+    value = getattr(__import__(module_name, globals(), None, [name], 1), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()).union(_exports))
@@ -0,0 +1,220 @@
+import os
+from collections.abc import Hashable
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from .core import Parameter
+from ._lib import handlers as _handlers
+from ._lib import handle_before_parse as _handle_before_parse
+from ._binder import get_binder as _get_binder
+from .utils import merge_parameter_trees
+
+
+class _Missing:
+    def __repr__(self):
+        return '<missing>'
+
+
+# Empty CSV cells and None values are replaced by the default values
+_missing = _Missing()
+_bool_values = {
+    'true': True, 'yes': True, 'on': True, '1': True,
+    'false': False, 'no': False, 'off': False, '0': False,
+}
+
+
+def read_columns(data) -> Tuple[Dict[str, List[Any]], int]:
+    '''
+    Reads columnar data into a dictionary of lists indexed by the column names.
+
+    Arguments:
+        data: Path to a CSV file, a dictionary of sequences, or a NumPy structured array
+
+    Returns: Tuple of the columns and the number of rows.
+    '''
+    if isinstance(data, (str, os.PathLike)):
+        import csv
+
+        with open(data, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            values = list(zip(*reader)) if header else []
+        columns = {name: list(x) for name, x in zip(header, values)}
+        if not columns:
+            columns = {name: [] for name in header}
+    elif getattr(getattr(data, 'dtype', None), 'names', None) is not None:
+        # NumPy structured array (numpy itself is not imported)
+        columns = {name: data[name].tolist() for name in data.dtype.names}
+    elif isinstance(data, dict):
+        columns = {name: x.tolist() if hasattr(x, 'tolist') else list(x) for name, x in data.items()}
+    else:
+        raise ValueError(f'Unsupported columnar data of type {type(data).__name__}')
+
+    lengths = set(map(len, columns.values()))
+    if len(lengths) > 1:
+        raise ValueError('All columns must have the same length')
+    length = lengths.pop() if lengths else 0
+    columns = {name.lstrip('-').replace('-', '_'): [_missing if x is None or x == '' else x for x in values]
+               for name, values in columns.items()}
+    return columns, length
+
+
+def _convert_scalar(tp, value):
+    if type(value) is tp:
+        return value
+    if tp == bool:
+        if isinstance(value, str):
+            return _bool_values[value.strip().lower()]
+        if value in (0, 1):
+            return bool(value)
+        raise ValueError(value)
+    if tp == int and isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)
+    return tp(value)
+
+
+def _map_distinct(fn, values: List[Any]) -> List[Any]:
+    # The function is called once per distinct value of the column
+    results: Dict[Any, Any] = {_missing: _missing}
+    try:
+        for x in values:
+            if x not in results:
+                results[x] = fn(x)
+    except TypeError:
+        if all(isinstance(x, Hashable) for x in values):
+            raise
+        return [x if x is _missing else fn(x) for x in values]
+    return [results[x] for x in values]
+
+
+def _convert_column(name: str, values: List[Any], parameter, converters) -> List[Any]:
+    tp = parameter.argument_type
+    if tp in (str, int, float, bool) and any(type(x) is not tp and x is not _missing for x in values):
+        def convert(value):
+            try:
+                return _convert_scalar(tp, value)
+            except (TypeError, ValueError, KeyError):
+                raise ValueError(f'Column {name!r}: invalid {tp.__name__} value: {value!r}')
+        values = _map_distinct(convert, values)
+
+    if parameter.choices is not None:
+        invalid = set(values).difference(parameter.choices)
+        invalid.discard(_missing)
+        if invalid:
+            choices = ', '.join(map(repr, parameter.choices))
+            raise ValueError(f'Column {name!r}: invalid choice: {sorted(invalid, key=repr)[0]!r} (choose from {choices})')
+
+    if converters:
+        def parse(value):
+            for converter in converters:
+                ok, value = converter.parse_value(parameter, value)
+                if ok:
+                    break
+            return value
+        # Lists are copied, so that the rows do not share mutable values
+        values = [list(x) if type(x) is list else x for x in _map_distinct(parse, values)]
+    return values
+
+
+def _get_switches(parameters: Parameter) -> Optional[Dict[str, List[str]]]:
+    switches = dict()
+    for param in parameters.enumerate_parameters():
+        if hasattr(param.type, '__conditional_fmap__'):
+            # The selected type can depend on any argument
+            return None
+        if hasattr(param.type, '__conditional_map__'):
+            switches[param.argument_name] = list(param.type.__conditional_map__.keys())
+    return switches
+
+
+def bind_many(parameters: Parameter, data, ignore: Optional[Set[str]] = None,
+              before_parse: Optional[Callable] = None,
+              after_parse: Optional[Callable[[Parameter, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None
+              ) -> List[Dict[str, Any]]:
+    '''
+    Binds each row of the columnar data into a kwargs dictionary.
+    The columns are indexed by the argument names (or option names) and the values are converted
+    and validated once per column instead of once per cell. Rows are grouped by the values of the conditional
+    types, and each group is bound by the binder compiled for its parameter tree.
+    The before_parse callbacks get None as the runtime.
+
+    Arguments:
+        parameters: Parameters to bind
+        data: Path to a CSV file, a dictionary of sequences, or a NumPy structured array
+        ignore: Set of parameters to ignore
+        before_parse: Callback to be called with the raw values of each group of rows
+        after_parse: Callback to be called with the kwargs of each row
+
+    Returns: List of kwargs in the same order as the rows.
+    '''
+    columns, length = read_columns(data)
+    switches = _get_switches(parameters) if before_parse is None else None
+    switch_names = [x for x in (columns.keys() if switches is None else switches.keys()) if x in columns]
+    used_columns: Set[str] = set()
+    for name, choices in (switches or dict()).items():
+        if name in columns:
+            used_columns.add(name)
+            invalid = set(columns[name]).difference(choices)
+            invalid.discard(_missing)
+            if invalid:
+                raise ValueError(f'Column {name!r}: invalid choice: {sorted(invalid, key=repr)[0]!r} '
+                                 f'(choose from {", ".join(map(repr, choices))})')
+    callbacks = [before_parse] if before_parse is not None else None
+
+    groups: Dict[Any, List[int]] = dict()
+    for i, key in enumerate(zip(*[columns[x] for x in switch_names]) if switch_names else [()] * length):
+        try:
+            groups.setdefault(key, []).append(i)
+        except TypeError:
+            groups[object()] = [i]
+
+    results: List[Any] = [None] * length
+    for rows in groups.values():
+        raw_kwargs = {name: columns[name][rows[0]] for name in switch_names
+                      if columns[name][rows[0]] is not _missing}
+        tree = parameters
+        if any(getattr(h, 'before_parse', None) is not None for h in _handlers) or callbacks:
+            new_parameters = _handle_before_parse(None, parameters, raw_kwargs, callbacks)
+            tree = merge_parameter_trees(parameters, new_parameters)
+        # The columns are converted by the parse_value handlers once per distinct value below
+        binder = _get_binder(tree, ignore, convert=False)
+        plan = binder.plan
+
+        leaves = dict()
+        for i, parameter in enumerate(plan.nodes):
+            if parameter.parameter.is_container or parameter.argument_type is None:
+                continue
+            leaves[plan.argument_names[i]] = i
+            if plan.full_names[i] is not None:
+                leaves.setdefault(plan.full_names[i], i)
+
+        group_columns = []
+        for name, values in columns.items():
+            i = leaves.get(name)
+            if i is None:
+                continue
+            used_columns.add(name)
+            values = [values[r] for r in rows] if len(rows) < length else values
+            if plan.nodes[i].default_factory is None and _missing in values:
+                raise ValueError(f'Row {rows[values.index(_missing)]}: missing required value {name!r}')
+            group_columns.append((plan.argument_names[i], _convert_column(
+                name, values, plan.nodes[i], plan.converters[i])))
+
+        present = {x for x, _ in group_columns}
+        for i, parameter in enumerate(plan.nodes):
+            if parameter.parameter.is_container or parameter.default_factory is not None:
+                continue
+            if parameter.argument_type in {str, float, bool, int}:
+                name = plan.argument_names[i]
+                if name not in present:
+                    raise ValueError(f'Missing required column {name!r}')
+
+        for k, r in enumerate(rows):
+            arguments = {name: values[k] for name, values in group_columns if values[k] is not _missing}
+            kwargs, _ = binder(arguments)
+            if after_parse is not None:
+                kwargs = after_parse(binder.parameters, arguments, kwargs)
+            results[r] = kwargs
+
+    unknown = set(columns.keys()).difference(used_columns)
+    if unknown and length > 0:
+        raise ValueError(f'Unknown columns: {", ".join(sorted(unknown))}')
+    return results
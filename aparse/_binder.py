@@ -0,0 +1,235 @@
+import functools
+import dataclasses
+from typing import Any, Dict, List, Optional, Tuple
+from .core import Parameter, ParameterPlan, DefaultFactory, _empty
+from ._lazy import lazy_proxy_type
+from . import _lib
+from ._instrument import timed
+
+
+class Binder:
+    """
+    Binds argument dictionaries to kwargs for a specific parameter tree.
+    The first call evaluates the consolidated plan directly. When the binder is reused,
+    a function is generated which evaluates the tree bottom-up with straight-line code,
+    where the handler chains were resolved when the function was generated.
+    If lazy is set, the nested containers (e.g., dataclasses) are bound to LazyProxy objects,
+    which convert the values and construct the containers when they are first accessed.
+    If convert is not set, the values were already converted (e.g., once per column by bind_many)
+    and the parse_value handlers are not called.
+    """
+    def __init__(self, parameters: Parameter, lazy: bool = False, convert: bool = True):
+        self.parameters = parameters
+        self.lazy = lazy
+        self.convert = convert
+        self.known_arguments = frozenset(ParameterPlan.of(parameters).argument_names)
+        self.plan = _lib.compile_plan(_lib.consolidate_parameter_tree_with_path(parameters))
+        self._source: Optional[str] = None
+        self._bind = None
+        self._calls = 0
+
+    @property
+    def source(self) -> str:
+        if self._source is None:
+            self._compile()
+        return self._source
+
+    @timed('compile_binder')
+    def _compile(self):
+        self._source, namespace = _generate_binder(self.plan, self.lazy, self.convert)
+        exec(compile(self._source, '<aparse binder>', 'exec'), namespace)
+        self._bind = namespace['bind']
+        return self._bind
+
+    @timed('bind_parameters')
+    def __call__(self, arguments: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+        known_arguments = self.known_arguments
+        unknown_kwargs = {k: v for k, v in arguments.items() if k not in known_arguments}
+        if self.lazy:
+            # The proxies read the arguments when they are accessed
+            arguments = dict(arguments)
+        bind = self._bind
+        if bind is None:
+            self._calls += 1
+            if self._calls == 1:
+                # Single invocations (e.g., CLIs) do not pay for the code generation
+                return _interpret(self.plan, 0, arguments, self.lazy, self.convert), unknown_kwargs
+            bind = self._compile()
+        return bind(arguments), unknown_kwargs
+
+
+def _constructs_type(default_factory, tp) -> bool:
+    # e.g., dataclasses.field(default_factory=tp)
+    return getattr(default_factory, 'factory', default_factory) is tp
+
+
+def _can_construct_default_type(default_factory, tp) -> bool:
+    # If all init fields are bound, the dataclass can be constructed directly instead of
+    # replacing the fields of the default, unless the default is of another class (e.g., a subclass).
+    # A None default has no fields to replace.
+    if not dataclasses.is_dataclass(tp) or not isinstance(default_factory, DefaultFactory):
+        return False
+    value = default_factory._get_value()
+    return value is None or type(value) is tp
+
+
+def _is_lazy_container(plan: ParameterPlan, i: int) -> bool:
+    parameter = plan.nodes[i]
+    return i != 0 and bool(parameter.parameter.is_container) and parameter.type != dict
+
+
+def _bind_node(plan: ParameterPlan, i: int, arguments: Dict[str, Any], values: Dict[int, Any], convert: bool = True):
+    # Interpreted equivalent of the code generated for a single node by _generate_binder
+    parameter = plan.nodes[i]
+    if plan.binders[i]:
+        children = [(plan.nodes[j], values[j]) for j in plan.children[i]]
+        for binder in plan.binders[i]:
+            ok, value = binder.bind(parameter, arguments, children)
+            if ok:
+                return value
+
+    if parameter.parameter.is_container:
+        value = {plan.nodes[j].name: values[j] for j in plan.children[i]
+                 if plan.nodes[j].name is not None and values[j] is not _empty}
+        if parameter.type == dict:
+            return value
+        if parameter.default_factory is None or _constructs_type(parameter.default_factory, parameter.type) or (
+                _can_construct_default_type(parameter.default_factory, parameter.type) and
+                value.keys() >= {x.name for x in dataclasses.fields(parameter.type) if x.init}):
+            return parameter.type(**value)
+        return dataclasses.replace(parameter.default_factory(), **value)
+
+    argument_name = plan.argument_names[i]
+    value = parameter.default_factory() if parameter.default_factory is not None else _empty
+    if argument_name in arguments:
+        value = arguments[argument_name]
+        if value == parameter.default:
+            value = parameter.default_factory()
+        elif convert:
+            for converter in plan.converters[i]:
+                ok, value = converter.parse_value(parameter, value)
+                if ok:
+                    break
+    return value
+
+
+def _interpret(plan: ParameterPlan, root: int, arguments: Dict[str, Any], lazy: bool = False, convert: bool = True):
+    values: Dict[int, Any] = dict()
+    stack = [(root, False)]
+    while stack:
+        i, expanded = stack.pop()
+        if expanded:
+            values[i] = _bind_node(plan, i, arguments, values, convert)
+        elif lazy and i != root and _is_lazy_container(plan, i):
+            values[i] = lazy_proxy_type(plan.nodes[i].type)(functools.partial(_interpret, plan, i, arguments, lazy, convert))
+        else:
+            stack.append((i, True))
+            stack.extend((j, False) for j in plan.children[i])
+    return values[root]
+
+
+def _generate_binder(plan: ParameterPlan, lazy: bool = False, convert: bool = True) -> Tuple[str, Dict[str, Any]]:
+    namespace: Dict[str, Any] = dict(_empty=_empty, dataclasses=dataclasses)
+    lines: List[str] = []
+
+    def emit(indent: int, line: str):
+        lines.append('    ' * indent + line)
+
+    def emit_default(i: int, indent: int):
+        parameter = plan.nodes[i]
+        if parameter.parameter.is_container:
+            emit(indent, f'v{i} = {{}}')
+            for j in plan.children[i]:
+                if plan.nodes[j].name is not None:
+                    emit(indent, f'if v{j} is not _empty:')
+                    emit(indent + 1, f'v{i}[{plan.nodes[j].name!r}] = v{j}')
+            if parameter.type != dict:
+                if parameter.default_factory is None or _constructs_type(parameter.default_factory, parameter.type):
+                    # The missing fields are filled by the defaults of the type
+                    emit(indent, f'v{i} = t{i}(**v{i})')
+                elif _can_construct_default_type(parameter.default_factory, parameter.type):
+                    # The default is only constructed if some of the fields are missing
+                    namespace[f'k{i}'] = frozenset(x.name for x in dataclasses.fields(parameter.type) if x.init)
+                    emit(indent, f'if v{i}.keys() >= k{i}:')
+                    emit(indent + 1, f'v{i} = t{i}(**v{i})')
+                    emit(indent, 'else:')
+                    emit(indent + 1, f'v{i} = dataclasses.replace(f{i}(), **v{i})')
+                else:
+                    emit(indent, f'v{i} = dataclasses.replace(f{i}(), **v{i})')
+            return
+
+        argument_name = plan.argument_names[i]
+        if parameter.default_factory is not None:
+            emit(indent, f'v{i} = f{i}()')
+        else:
+            emit(indent, f'v{i} = _empty')
+        emit(indent, f'if {argument_name!r} in arguments:')
+        emit(indent + 1, f'v{i} = arguments[{argument_name!r}]')
+        if isinstance(parameter.default_factory, DefaultFactory):
+            # DefaultFactory.get_default returns either an immutable value or the factory
+            namespace[f'd{i}'] = parameter.default
+            emit(indent + 1, f'if v{i} == d{i}:')
+        else:
+            emit(indent + 1, f'if v{i} == n{i}.default:')
+        emit(indent + 2, f'v{i} = f{i}()')
+        converters = plan.converters[i] if convert else ()
+        if converters:
+            emit(indent + 1, 'else:')
+            for k, converter in enumerate(converters):
+                namespace[f'c{i}_{k}'] = converter
+                emit(indent + 2 + k, f'ok, v{i} = c{i}_{k}.parse_value(n{i}, v{i})')
+                if k + 1 < len(converters):
+                    emit(indent + 2 + k, 'if not ok:')
+
+    # The code of each node follows the code of its children. In the lazy mode, the code
+    # of the subtree of a nested container is wrapped in a function evaluated by a LazyProxy.
+    blocks: Dict[int, List[str]] = dict()
+    for i in plan.postorder:
+        lines = []
+        for j in plan.children[i]:
+            lines.extend(blocks.pop(j))
+        parameter = plan.nodes[i]
+        namespace[f'n{i}'] = parameter
+        namespace[f't{i}'] = parameter.type
+        namespace[f'f{i}'] = parameter.default_factory
+        indent = 0
+        binders = plan.binders[i]
+        if binders:
+            children = ', '.join(f'(n{j}, v{j})' for j in plan.children[i])
+            emit(indent, f'children = [{children}]')
+            for k, binder in enumerate(binders):
+                namespace[f'b{i}_{k}'] = binder
+                emit(indent, f'ok, v{i} = b{i}_{k}.bind(n{i}, arguments, children)')
+                emit(indent, 'if not ok:')
+                indent += 1
+        emit_default(i, indent)
+        if lazy and _is_lazy_container(plan, i):
+            namespace[f'p{i}'] = lazy_proxy_type(parameter.type)
+            lines = [f'def g{i}():'] + ['    ' + x for x in lines] + [f'    return v{i}', f'v{i} = p{i}(g{i})']
+        blocks[i] = lines
+    lines = ['def bind(arguments):'] + ['    ' + x for x in blocks[0]] + ['    return v0']
+    return '\n'.join(lines) + '\n', namespace
+
+
+def get_binder(parameters: Parameter, ignore=None, lazy: bool = False, convert: bool = True) -> Binder:
+    # Binders are cached on the parameter tree, per set of ignored parameters and per mode,
+    # and are released together with the tree
+    ignored = frozenset(ignore) if ignore else None
+    key = (ignored, lazy, convert)
+    binders = parameters._binders
+    if binders is None:
+        binders = dict()
+        object.__setattr__(parameters, '_binders', binders)
+    version, binder = binders.get(key, (None, None))
+    if binder is None or version != _lib._handlers_version:
+        tree = parameters
+        if ignored is not None:
+            tree = _lib.ignore_parameters(tree, ignored)
+        binder = Binder(tree, lazy, convert)
+        binders[key] = (_lib._handlers_version, binder)
+    return binder
+
+
+def bind_parameters(parameters: Parameter, arguments: Dict[str, Any], ignore=None,
+                    lazy: bool = False) -> Tuple[Any, Dict[str, Any]]:
+    return get_binder(parameters, ignore, lazy)(arguments)
@@ -0,0 +1,155 @@
+import os
+import sys
+import inspect
+from typing import Any, Callable, Dict, Optional
+from .core import Parameter
+
+
+_CACHE_FORMAT = 2
+
+
+def get_cache_dir() -> Optional[str]:
+    '''
+    Returns the directory of the persistent parameter cache or None if the cache is disabled.
+    The cache is enabled by setting the APARSE_CACHE environment variable either to "1",
+    in which case "$XDG_CACHE_HOME/aparse" (defaulting to "~/.cache/aparse") is used,
+    or to the path of the cache directory.
+    '''
+    value = os.environ.get('APARSE_CACHE', '')
+    if value in ('', '0'):
+        return None
+    if value == '1':
+        cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(cache_home, 'aparse')
+    return value
+
+
+def file_fingerprint(path: str) -> Optional[str]:
+    import hashlib
+
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def get_source_file(obj: Any) -> Optional[str]:
+    module = sys.modules.get(getattr(obj, '__module__', None) or '', None)
+    path = getattr(module, '__file__', None)
+    if path is None or not path.endswith('.py'):
+        return None
+    return os.path.abspath(path)
+
+
+def collect_source_files(obj: Any, parameters: Parameter):
+    objects = [obj]
+    if inspect.isclass(obj):
+        objects.extend(inspect.getmro(obj))
+    objects.extend(p.type for p in parameters.enumerate_parameters() if p.type is not None)
+    files = set()
+    for x in objects:
+        path = get_source_file(x)
+        if path is not None:
+            files.add(path)
+    return files
+
+
+def _is_cacheable(parameters: Parameter):
+    for p in parameters.enumerate_parameters():
+        # Conditional types are typing.Union objects with extra attributes,
+        # which do not survive pickling.
+        if hasattr(p.type, '__conditional_map__') or hasattr(p.type, '__conditional_fmap__'):
+            return False
+    return True
+
+
+def _unwrap_handler(handler):
+    # Handlers are wrapped while an instrumentation is active
+    return getattr(handler, '__wrapped__', handler)
+
+
+def _get_cache_key(obj: Any) -> Optional[str]:
+    import hashlib
+    from . import __version__
+    from ._lib import handlers
+
+    qualname = getattr(obj, '__qualname__', None)
+    source_file = get_source_file(obj)
+    if qualname is None or '<locals>' in qualname or source_file is None:
+        return None
+    key = '\n'.join([
+        str(_CACHE_FORMAT), __version__, sys.version,
+        obj.__module__, qualname, source_file,
+    ] + [f'{type(h).__module__}.{type(h).__qualname__}' for h in map(_unwrap_handler, handlers)])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _load(path: str) -> Optional[Parameter]:
+    import pickle
+
+    try:
+        with open(path, 'rb') as f:
+            dependencies, parameters = pickle.load(f)
+    except Exception:
+        return None
+    for dependency, fingerprint in dependencies.items():
+        if file_fingerprint(dependency) != fingerprint:
+            return None
+    return parameters
+
+
+def _get_handler_source_files():
+    # The handlers (and the pipeline applying them) can change without being renamed
+    from . import _lib, utils
+
+    objects = [_lib.preprocess_parameters, utils.get_parameters] + [type(_unwrap_handler(h)) for h in _lib.handlers]
+    files = set()
+    for x in objects:
+        path = get_source_file(x)
+        if path is not None:
+            files.add(path)
+    return files
+
+
+def _store(path: str, obj: Any, parameters: Parameter):
+    import pickle
+
+    if not _is_cacheable(parameters):
+        return
+    files = collect_source_files(obj, parameters) | _get_handler_source_files()
+    dependencies: Dict[str, Optional[str]] = {x: file_fingerprint(x) for x in files}
+    try:
+        data = pickle.dumps((dependencies, parameters), protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        # Atomic, so that concurrent processes never see partial files
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def cached_parameters(obj: Any, build: Callable[[], Parameter]) -> Parameter:
+    '''
+    Returns the preprocessed parameters of obj, using the persistent cache if enabled.
+    The cache entry is invalidated automatically whenever any of the source files the
+    parameters were collected from changes, or when aparse, the registered handlers, or the
+    source files of the handlers change.
+    '''
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return build()
+    key = _get_cache_key(obj)
+    if key is None:
+        return build()
+    path = os.path.join(cache_dir, f'{key}.pickle')
+    parameters = _load(path)
+    if parameters is None:
+        parameters = build()
+        _store(path, obj, parameters)
+    return parameters
@@ -1,17 +1,70 @@
-from typing import Type
+from typing import Any, Optional, Tuple, Type
+from collections import OrderedDict
 import dataclasses
-from .core import Handler, AllArguments, ParameterWithPath, Runtime, _empty, DefaultFactory
-from ._lib import register_handler, preprocess_parameter
+from .core import Handler, AllArguments, Parameter, ParameterWithPath, Runtime, _empty, DefaultFactory
+from .core import resolve_variant
+from . import _lib
+from ._lib import register_handler, preprocess_parameters
 from .utils import get_parameters
 from .utils import prefix_parameter, merge_parameter_trees
 
 
+# Preprocessed and prefixed subtrees of the conditional type variants, keyed by
+# (variant type, parameter name, prefix, parent path). The subtrees depend on the handlers,
+# so the cache is dropped when the handlers change. The least recently used subtrees are
+# evicted, because the variant types can be generated dynamically (e.g., by FunctionConditionalType).
+_variant_cache: 'OrderedDict[Tuple[Any, str, bool, Optional[str]], Parameter]' = OrderedDict()
+_variant_cache_version = None
+_variant_cache_size = 256
+
+
+def _get_variant_parameter(param: ParameterWithPath, tp) -> Parameter:
+    global _variant_cache_version
+
+    if _variant_cache_version != _lib._handlers_version:
+        _variant_cache.clear()
+        _variant_cache_version = _lib._handlers_version
+    prefix = bool(param.type.__conditional_prefix__)
+    parent_name = param.parent.full_name if param.parent is not None else None
+    key = (tp, param.name, prefix, parent_name)
+    parameter = _variant_cache.get(key)
+    if parameter is None:
+        parameter = preprocess_parameters(get_parameters(tp))
+        parameter = parameter.replace(name=param.name, type=tp)
+        if not prefix:
+            parameter = parameter.replace(_argument_name=(None,))
+        if parent_name is not None:
+            parameter = prefix_parameter(parameter, parent_name)
+        _variant_cache[key] = parameter
+        while len(_variant_cache) > _variant_cache_size:
+            _variant_cache.popitem(last=False)
+    else:
+        _variant_cache.move_to_end(key)
+    return parameter
+
+
+def precompile_variants(parameters: Parameter):
+    '''
+    Resolves all variants of the conditional types in the parameter tree,
+    so that parsing does not need to build the variant subtrees.
+    The variants declared as "package.module:ClassName" strings are imported.
+    The variants of FunctionConditionalType cannot be enumerated and are resolved when parsing.
+    '''
+    for param in parameters.enumerate_parameters():
+        if ConditionalTypeHandler._does_handle(param.type):
+            for tp in param.type.__conditional_map__.values():
+                if tp is not None:
+                    _get_variant_parameter(param, resolve_variant(tp))
+
+
 @register_handler
 class DefaultHandler(Handler):
+    path_dependent = False
+
     def preprocess_parameter(self, param: ParameterWithPath):
         if (len(param.children) > 0 or dataclasses.is_dataclass(param.type)) \
            and (param.parameter.is_container is None or param.parameter.is_container):
-            return True, dataclasses.replace(param.parameter, is_container=True)
+            return True, param.replace(is_container=True)
         if param.type is None:
             return True, None
 
@@ -55,6 +108,10 @@ class DefaultHandler(Handler):
 
 @register_handler
 class AllArgumentsHandler(Handler):
+    path_dependent = False
+
+    types = (AllArguments,)
+
     def add_parameter(self, param, runtime, *args, **kwargs):
         if param.type == AllArguments:
             return True
@@ -74,6 +131,8 @@ class AllArgumentsHandler(Handler):
 
 @register_handler
 class SimpleListHandler(Handler):
+    path_dependent = False
+
     def _list_type(self, tp: Type):
         if getattr(tp, '__origin__', None) == list:
             tp = tp.__args__[0]
@@ -81,6 +140,9 @@ class SimpleListHandler(Handler):
                 return tp
         return None
 
+    def handles_type(self, tp):
+        return self._list_type(tp) is not None
+
     def preprocess_parameter(self, parameter):
         if self._list_type(parameter.type) is not None:
             return True, parameter.replace(argument_type=str)
@@ -96,24 +158,31 @@ class SimpleListHandler(Handler):
         return False, value
 
 
+def _str_comp_value(value):
+    if value is not None:
+        value = str(value)
+    return value
+
+
 @register_handler
 class FromStrHandler(Handler):
+    path_dependent = False
+
     def _does_handle(self, tp: Type):
         if tp is None:
             return False
         return hasattr(tp, 'from_str')
 
+    def handles_type(self, tp):
+        return self._does_handle(tp)
+
     def preprocess_parameter(self, parameter):
         if parameter is not None and self._does_handle(parameter.type):
             default_factory = parameter.default_factory
             if default_factory is not None:
-                def comp_value_fn(value):
-                    if value is not None:
-                        value = str(value)
-                    return value
                 default_factory = DefaultFactory(
                     default_factory.factory,
-                    comp_value_fn)
+                    _str_comp_value)
             return True, parameter.replace(
                 argument_type=str,
                 default_factory=default_factory)
@@ -127,10 +196,15 @@ class FromStrHandler(Handler):
 
 @register_handler
 class ConditionalTypeHandler(Handler):
+    path_dependent = False
+
     @staticmethod
     def _does_handle(tp: Type):
         return hasattr(tp, '__conditional_map__')
 
+    def handles_type(self, tp):
+        return self._does_handle(tp)
+
     def preprocess_parameter(self, parameter):
         if self._does_handle(parameter.type):
             default_key = getattr(parameter.type, '__conditional_default__', _empty)
@@ -148,13 +222,8 @@ class ConditionalTypeHandler(Handler):
                 key = kwargs.get(param.argument_name, default_key)
                 tp = param.type.__conditional_map__.get(key, None)
                 if tp is not None:
-                    parameter = get_parameters(tp).walk(preprocess_parameter)
-                    parameter = parameter.replace(name=param.name, type=tp)
-                    if not param.type.__conditional_prefix__:
-                        parameter = parameter.replace(_argument_name=(None,))
-                    if param.parent is not None and param.parent.full_name is not None:
-                        parameter = prefix_parameter(parameter, param.parent.full_name)
-                    result.append(parameter)
+                    # Variants declared as "package.module:ClassName" are imported here
+                    result.append(_get_variant_parameter(param, resolve_variant(tp)))
         if len(result) > 0:
             result = merge_parameter_trees(*result)
             return result
@@ -169,31 +238,27 @@ class ConditionalTypeHandler(Handler):
 
 @register_handler
 class FunctionConditionalTypeHandler(Handler):
+    path_dependent = False
+
     @staticmethod
     def _does_handle(tp: Type):
         return hasattr(tp, '__conditional_fmap__')
 
+    def handles_type(self, tp):
+        return self._does_handle(tp)
+
     def preprocess_parameter(self, parameter):
         if self._does_handle(parameter.type):
             return True, parameter
         return False, parameter
 
-    def _get_parameter(self, param, tp):
-        parameter = get_parameters(tp).walk(preprocess_parameter)
-        parameter = parameter.replace(name=param.name, type=tp)
-        if not param.type.__conditional_prefix__:
-            parameter = parameter.replace(_argument_name=(None,))
-        if param.parent is not None and param.parent.full_name is not None:
-            parameter = prefix_parameter(parameter, param.parent.full_name)
-        return parameter
-
     def before_parse(self, root, parser, kwargs):
         result = []
         for param in root.enumerate_parameters():
             if self._does_handle(param.type):
                 tp = param.type.__conditional_fmap__(kwargs)
                 if tp is not None:
-                    result.append(self._get_parameter(param, tp))
+                    result.append(_get_variant_parameter(param, tp))
         if len(result) > 0:
             result = merge_parameter_trees(*result)
             return result
@@ -208,9 +273,14 @@ class FunctionConditionalTypeHandler(Handler):
 
 @register_handler
 class WithArgumentNameHandler(Handler):
+    path_dependent = False
+
     def _does_handle(self, tp: Type):
         return hasattr(tp, '__aparse_argname__')
 
+    def handles_type(self, tp):
+        return self._does_handle(tp)
+
     def preprocess_parameter(self, parameter):
         if self._does_handle(parameter.type):
             tp = parameter.type.__supertype__
@@ -0,0 +1,143 @@
+import functools
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+class PhaseStats:
+    '''
+    Number of calls and the total wall time (in seconds) of a pipeline phase, handler method, or callback.
+    The time of nested phases is included in the time of the enclosing phase.
+    '''
+    __slots__ = ('calls', 'total')
+
+    def __init__(self, calls: int = 0, total: float = 0.):
+        self.calls = calls
+        self.total = total
+
+    def __repr__(self):
+        return f'PhaseStats(calls={self.calls}, total={self.total:.6f})'
+
+
+class _Collector:
+    def __init__(self, callback: Optional[Callable[[str, float], None]]):
+        self.callback = callback
+        self.stats: Dict[str, PhaseStats] = dict()
+
+
+# Active collectors, the instrumentation is disabled when empty
+_collectors: List[_Collector] = []
+
+
+def record(name: str, elapsed: float):
+    for collector in _collectors:
+        stats = collector.stats.get(name)
+        if stats is None:
+            stats = collector.stats[name] = PhaseStats()
+        stats.calls += 1
+        stats.total += elapsed
+        if collector.callback is not None:
+            collector.callback(name, elapsed)
+
+
+def timed(name: str):
+    '''
+    Decorator timing the function as a phase while an instrumentation is active.
+    '''
+    def wrap(fn):
+        @functools.wraps(fn)
+        def timed_fn(*args, **kwargs):
+            if not _collectors:
+                return fn(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, perf_counter() - start)
+        return timed_fn
+    return wrap
+
+
+def timed_callback(kind: str, callback: Callable) -> Callable:
+    name = f'{kind}:{getattr(callback, "__qualname__", repr(callback))}'
+
+    @functools.wraps(callback)
+    def timed_fn(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return callback(*args, **kwargs)
+        finally:
+            record(name, perf_counter() - start)
+    return timed_fn
+
+
+_handler_methods = ('preprocess_parameter', 'parse_value', 'bind', 'add_parameter', 'before_parse', 'after_parse')
+
+
+def _timed_handler(handler):
+    from .core import Handler, _overrides
+
+    methods: Dict[str, Any] = dict(
+        types=handler.types,
+        path_dependent=handler.path_dependent,
+        handles_type=lambda self, tp: handler.handles_type(tp),
+        __wrapped__=handler,
+        __repr__=lambda self: f'Timed({handler!r})')
+    for method in _handler_methods:
+        if method in ('before_parse', 'after_parse'):
+            if getattr(handler, method, None) is None:
+                continue
+        elif not _overrides(handler, method):
+            continue
+        name = f'{type(handler).__name__}.{method}'
+        methods[method] = _timed_method(name, getattr(handler, method))
+    return type(f'Timed{type(handler).__name__}', (Handler,), methods)()
+
+
+def _timed_method(name: str, fn: Callable):
+    def method(self, *args, **kwargs):
+        start = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(name, perf_counter() - start)
+    return method
+
+
+def _swap_handlers(wrap: bool):
+    from . import _lib
+
+    if wrap:
+        _lib.handlers[:] = [_timed_handler(h) for h in _lib.handlers]
+    else:
+        _lib.handlers[:] = [getattr(h, '__wrapped__', h) for h in _lib.handlers]
+    # Handler chains and compiled binders hold the handler instances
+    _lib._handler_chains.clear()
+    _lib._handlers_version += 1
+
+
+@contextmanager
+def instrument(callback: Optional[Callable[[str, float], None]] = None) -> Iterator[Dict[str, PhaseStats]]:
+    '''
+    Measures the wall time and the number of calls of the pipeline phases
+    (get_parameters, preprocess_parameter, consolidate_parameter_tree, handle_before_parse,
+    add_parameters, parse_args, compile_binder, bind_parameters, handle_after_parse),
+    of the methods of the registered handlers (e.g., "DefaultHandler.add_parameter"),
+    and of the before_parse and after_parse callbacks (e.g., "before_parse:my_callback").
+    When no instrumentation is active, the overhead is a single check per phase.
+
+    Arguments:
+        callback: Function called with the name and the elapsed time of every measured call
+
+    Returns: Context manager returning the dictionary of the statistics, which is filled while the context is active.
+    '''
+    collector = _Collector(callback)
+    if not _collectors:
+        _swap_handlers(True)
+    _collectors.append(collector)
+    try:
+        yield collector.stats
+    finally:
+        _collectors.remove(collector)
+        if not _collectors:
+            _swap_handlers(False)
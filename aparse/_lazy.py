@@ -0,0 +1,104 @@
+import weakref
+import dataclasses
+from typing import Any, Callable, Type
+
+
+_unresolved = object()
+
+
+class LazyProxy:
+    '''
+    Proxy of a value, which is computed when the proxy is first accessed.
+    Attribute access, comparisons, hashing, iteration, pickling and copying are forwarded to the value,
+    and isinstance checks see the class of the value. The proxies of dataclasses are created by the
+    classes returned by lazy_proxy_type.
+    '''
+    __slots__ = ('_aparse_factory', '_aparse_value')
+
+    def __init__(self, factory: Callable[[], Any]):
+        object.__setattr__(self, '_aparse_factory', factory)
+        object.__setattr__(self, '_aparse_value', _unresolved)
+
+    def _aparse_resolve(self):
+        value = object.__getattribute__(self, '_aparse_value')
+        if value is _unresolved:
+            value = object.__getattribute__(self, '_aparse_factory')()
+            object.__setattr__(self, '_aparse_value', value)
+            # The factory holds the bound arguments
+            object.__setattr__(self, '_aparse_factory', None)
+        return value
+
+    @property  # type: ignore
+    def __class__(self):
+        return type(self._aparse_resolve())
+
+    def __getattr__(self, name):
+        return getattr(self._aparse_resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._aparse_resolve(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._aparse_resolve(), name)
+
+    def __dir__(self):
+        return dir(self._aparse_resolve())
+
+    def __repr__(self):
+        return repr(self._aparse_resolve())
+
+    def __str__(self):
+        return str(self._aparse_resolve())
+
+    def __eq__(self, other):
+        return self._aparse_resolve() == other
+
+    def __ne__(self, other):
+        return self._aparse_resolve() != other
+
+    def __hash__(self):
+        return hash(self._aparse_resolve())
+
+    def __bool__(self):
+        return bool(self._aparse_resolve())
+
+    def __len__(self):
+        return len(self._aparse_resolve())
+
+    def __iter__(self):
+        return iter(self._aparse_resolve())
+
+    def __contains__(self, item):
+        return item in self._aparse_resolve()
+
+    def __getitem__(self, key):
+        return self._aparse_resolve()[key]
+
+    def __call__(self, *args, **kwargs):
+        return self._aparse_resolve()(*args, **kwargs)
+
+    def __reduce_ex__(self, protocol):
+        # Pickled and copied as the value itself
+        return self._aparse_resolve().__reduce_ex__(protocol)
+
+
+# Proxy classes of the dataclasses, released together with the dataclasses
+_proxy_types: 'weakref.WeakKeyDictionary[type, Type[LazyProxy]]' = weakref.WeakKeyDictionary()
+
+
+def lazy_proxy_type(tp: Any) -> Type[LazyProxy]:
+    '''
+    Returns the proxy class for values of type tp. The proxy classes of dataclasses expose the fields
+    of the dataclass, so that dataclasses.is_dataclass, fields, asdict, astuple and replace accept the proxies.
+    '''
+    if not isinstance(tp, type) or not dataclasses.is_dataclass(tp):
+        return LazyProxy
+    proxy_type = _proxy_types.get(tp)
+    if proxy_type is None:
+        proxy_type = type(f'LazyProxy[{tp.__qualname__}]', (LazyProxy,), dict(
+            __slots__=(),
+            __module__=LazyProxy.__module__,
+            __dataclass_fields__=tp.__dataclass_fields__,
+            __dataclass_params__=getattr(tp, '__dataclass_params__', None)))
+        _proxy_types[tp] = proxy_type
+    return proxy_type
@@ -1,33 +1,99 @@
 import sys
-from typing import List, Dict, Any, Tuple
-import dataclasses
-from .core import Parameter, ParameterWithPath, Handler, Runtime, DefaultFactory, _empty
+import weakref
+from typing import List, Dict, Any, Optional, Tuple
+from .core import Parameter, ParameterWithPath, ParameterPlan, Handler, Runtime, DefaultFactory, _overrides
 from .utils import merge_parameter_trees, consolidate_parameter_tree
 from .utils import ignore_parameters
+from . import _instrument
+from ._instrument import timed
 
 
 handlers: List[Handler] = []
+# Handler chains per type and method. The types are weakly referenced, so that the types generated
+# at runtime (e.g., by FunctionConditionalType) are released together with their chains.
+_handler_chains: 'weakref.WeakKeyDictionary[Any, Dict[str, Tuple[Handler, ...]]]' = weakref.WeakKeyDictionary()
+# Incremented whenever the handlers change to invalidate compiled binders
+_handlers_version = 0
 
 
 def register_handler(handler):
+    global _handlers_version
     handlers.insert(0, handler())
+    _handler_chains.clear()
+    _handlers_version += 1
     return handler
 
 
+def get_handlers(tp: Any, method: str) -> Tuple[Handler, ...]:
+    """Returns handlers implementing the method which can handle the type tp, in priority order."""
+    try:
+        chains = _handler_chains.get(tp)
+    except TypeError:
+        # Unhashable type or a type which cannot be weakly referenced (e.g., None or a forward reference)
+        return tuple(h for h in handlers if _overrides(h, method) and h.handles_type(tp) is not False)
+    if chains is None:
+        chains = _handler_chains[tp] = dict()
+    chain = chains.get(method)
+    if chain is None:
+        chain = chains[method] = tuple(
+            h for h in handlers if _overrides(h, method) and h.handles_type(tp) is not False)
+    return chain
+
+
+def compile_plan(parameters: Parameter) -> ParameterPlan:
+    return ParameterPlan.of(parameters, get_handlers, _handlers_version)
+
+
 def preprocess_parameter(param: ParameterWithPath, children):
     handled = False
     param = param.replace(children=children)
     if param.name is not None:
-        for h in handlers:
+        chain = get_handlers(param.type, 'preprocess_parameter')
+        i = 0
+        while i < len(chain):
+            h = chain[i]
+            tp = param.type
             handled, param = h.preprocess_parameter(param)
-            if handled:
+            if handled or param is None:
                 break
+            i += 1
+            if param.type is not tp:
+                # The handler changed the type, continue with the remaining handlers for the new type
+                position = handlers.index(h)
+                chain = tuple(x for x in get_handlers(param.type, 'preprocess_parameter')
+                              if handlers.index(x) > position)
+                i = 0
     elif param.parameter.is_container is None:
-        param = dataclasses.replace(
-            param, parameter=dataclasses.replace(param.parameter, is_container=True))
+        param = param.replace(is_container=True)
     return param
 
 
+@timed('preprocess_parameter')
+def preprocess_parameters(parameters: Parameter) -> Parameter:
+    if any(h.path_dependent for h in handlers if _overrides(h, 'preprocess_parameter')):
+        return parameters.walk(preprocess_parameter)
+
+    # The subtrees shared by repeated classes are preprocessed once,
+    # the results are shared in the same way (by the identity of the nodes)
+    results: Dict[int, Optional[Parameter]] = dict()
+    stack = [(ParameterWithPath(parameters, None), False)]
+    while stack:
+        param, expanded = stack.pop()
+        key = id(param.parameter)
+        if key in results:
+            continue
+        if not expanded:
+            stack.append((param, True))
+            stack.extend((ParameterWithPath(x, param), False) for x in reversed(param.children) if id(x) not in results)
+            continue
+        children = [results[id(x)] for x in param.children]
+        result = preprocess_parameter(param, [x for x in children if x is not None])
+        if isinstance(result, ParameterWithPath):
+            result = result.parameter
+        results[key] = result
+    return results[id(parameters)]
+
+
 def parse_arguments_manually(args=None, defaults=None):
     kwargs = dict(**defaults) if defaults is not None else dict()
     if args is None:
@@ -52,8 +118,11 @@ def parse_arguments_manually(args=None, defaults=None):
     return kwargs
 
 
+@timed('handle_before_parse')
 def handle_before_parse(runtime: Runtime, parameters: Parameter, kwargs: Dict[str, str], callbacks=None):
     added_params: List[Parameter] = []
+    if callbacks and _instrument._collectors:
+        callbacks = [_instrument.timed_callback('before_parse', x) if x is not None else x for x in callbacks]
     for bp in [getattr(h, 'before_parse', None) for h in reversed(handlers)] + (callbacks or []):
         if bp is None:
             continue
@@ -62,11 +131,14 @@ def handle_before_parse(runtime: Runtime, parameters: Parameter, kwargs: Dict[st
             added_params.append(np)
 
     if len(added_params) > 0:
-        return merge_parameter_trees(*added_params).walk(preprocess_parameter)
+        return preprocess_parameters(merge_parameter_trees(*added_params))
     return None
 
 
+@timed('handle_after_parse')
 def handle_after_parse(parameters: Parameter, arguments: Dict[str, Any], kwargs: Dict[str, Any], callbacks=None):
+    if callbacks and _instrument._collectors:
+        callbacks = [_instrument.timed_callback('after_parse', x) if x is not None else x for x in callbacks]
     for ap in [getattr(h, 'after_parse', None) for h in reversed(handlers)] + (callbacks or []):
         if ap is None:
             continue
@@ -88,6 +160,7 @@ def set_defaults(parameters: Parameter, defaults: Dict[str, Any]):
     return parameters.walk(_call), defaults
 
 
+@timed('add_parameters')
 def add_parameters(parameters: Parameter, runtime: Runtime,
                    defaults: Dict[str, Any] = None,
                    soft_defaults: bool = False):
@@ -104,74 +177,67 @@ def add_parameters(parameters: Parameter, runtime: Runtime,
     # TODO: implement default's type validation!
     # parameters = merge_parameter_defaults(parameters, default_parameters, soft_defaults=soft_defaults)
 
-    for param in parameters.enumerate_parameters():
-        for h in handlers:
+    plan = compile_plan(parameters)
+    for param, chain in zip(plan.nodes, plan.adders):
+        for h in chain:
             if h.add_parameter(param, runtime):
                 break
         else:
             raise RuntimeError('There was no handler registered for adding arguments')
 
 
+@timed('consolidate_parameter_tree')
 def consolidate_parameter_tree_with_path(parameters: Parameter):
+    plan = ParameterPlan.of(parameters)
     parameters_with_paths = dict()
-    new_par_map = dict()
-    for p in parameters.enumerate_parameters():
+    for i, (p, full_name) in enumerate(zip(plan.nodes, plan.full_names)):
         if p.type is not None:
-            parameters_with_paths[p.full_name] = p
-
-    def _call(p, children):
-        if p.full_name not in new_par_map:
-            p2 = parameters_with_paths[p.full_name].replace(children=children)
-            new_par_map[p.full_name] = p2
-            return p2
+            parameters_with_paths[full_name] = i
+
+    # Nodes with the same full name are merged into the first node visited
+    # in reversed pre-order (i.e., post-order with reversed children).
+    # The children of the other nodes are prepended to its children.
+    representatives: Dict[Optional[str], int] = dict()
+    merged_children: Dict[int, List[int]] = dict()
+    for i in reversed(range(len(plan))):
+        full_name = plan.full_names[i]
+        children = [j for j in plan.children[i] if merged_children.get(j) is not None]
+        if full_name not in representatives:
+            representatives[full_name] = i
+            merged_children[i] = children
         else:
-            old_p = new_par_map[p.full_name]
-            old_children_names = set(ParameterWithPath(x, old_p).full_name for x in old_p.children)
-            for c in children:
-                c2 = ParameterWithPath(c, new_par_map[p.full_name])
-                if c2.full_name not in old_children_names:
-                    old_p.children.insert(0, c)
-    return parameters.walk(_call, reverse=True)
+            old_children = merged_children[representatives[full_name]]
+            old_children_names = set(plan.full_names[j] for j in old_children)
+            for j in children:
+                if plan.full_names[j] not in old_children_names:
+                    old_children.insert(0, j)
+            merged_children[i] = None
+
+    results: Dict[int, Parameter] = dict()
+
+    def build(i):
+        stack = [(i, False)]
+        while stack:
+            i, expanded = stack.pop()
+            if expanded:
+                node = plan.nodes[parameters_with_paths[plan.full_names[i]]]
+                results[i] = node.parameter.replace(children=[results[j] for j in merged_children[i]])
+            elif i not in results:
+                stack.append((i, True))
+                stack.extend((j, False) for j in merged_children[i] if j not in results)
+        return results[i]
+
+    if merged_children.get(0) is None:
+        return None
+    return build(0)
 
 
 def bind_parameters(parameters: Parameter, arguments: Dict[str, Any]):
-    unknown_kwargs = dict(**arguments)
-    for p in parameters.enumerate_parameters():
-        if p.argument_name in unknown_kwargs:
-            del unknown_kwargs[p.argument_name]
-
-    def bind(parameter: ParameterWithPath, children: List[Tuple[Parameter, Any]]):
-        was_handled = False
-        value = arguments
-        for h in handlers:
-            was_handled, value = h.bind(parameter, arguments, children)
-            if was_handled:
-                break
-        if was_handled:
-            return parameter, value
-
-        if parameter.parameter.is_container:
-            dict_vals = {p.name: x for p, x in children if p.name is not None and x != _empty}
-            if parameter.type == dict:
-                value = dict_vals
-            else:
-                if parameter.default_factory is None:
-                    value = parameter.type(**dict_vals)
-                else:
-                    value = dataclasses.replace(parameter.default_factory(), **dict_vals)
-        else:
-            value = parameter.default_factory() if parameter.default_factory is not None else _empty
-            if parameter.argument_name in arguments:
-                value = arguments[parameter.argument_name]
-                if value == parameter.default:
-                    value = parameter.default_factory()
-                else:
-                    was_handled = False
-                    for handler in handlers:
-                        was_handled, value = handler.parse_value(parameter, value)
-                        if was_handled:
-                            break
-        return parameter, value
-    parameters = consolidate_parameter_tree_with_path(parameters)
-    _, kwargs = parameters.walk(bind)
-    return kwargs, unknown_kwargs
+    # The binder compiled for the parameters is cached
+    from ._binder import bind_parameters as _bind_parameters
+    return _bind_parameters(parameters, arguments)
+
+
+# Importing the default handlers here guarantees that they are registered
+# before any handler registered by the user.
+from . import _handlers  # noqa: E402, F401
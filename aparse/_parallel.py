@@ -0,0 +1,50 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def _call_function(function: Callable, args: Tuple[Any, ...], kwargs: Dict[str, Any]):
+    # Executed in the workers. Only the function reference and the bound kwargs are pickled.
+    return function(*args, **kwargs)
+
+
+def _submit_all(executor, function: Callable, args, configs: Iterable[Dict[str, Any]]):
+    return [executor.submit(_call_function, function, args, kwargs) for kwargs in configs]
+
+
+def map_function(function: Callable, configs: Iterable[Dict[str, Any]], args: Tuple[Any, ...] = (),
+                 executor=None, max_workers: Optional[int] = None) -> List[Any]:
+    '''
+    Calls the function with each of the bound kwargs in parallel and returns the results in the input order.
+    If no executor is passed, a ProcessPoolExecutor is created for the call.
+    '''
+    if executor is not None:
+        return [x.result() for x in _submit_all(executor, function, args, configs)]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return [x.result() for x in _submit_all(executor, function, args, configs)]
+
+
+def imap_function_unordered(function: Callable, configs: Iterable[Dict[str, Any]], args: Tuple[Any, ...] = (),
+                            executor=None, max_workers: Optional[int] = None) -> Iterator[Tuple[int, Any]]:
+    '''
+    Calls the function with each of the bound kwargs in parallel and yields
+    the tuples of the input index and the result as the calls complete.
+    '''
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    futures = []
+    try:
+        futures = _submit_all(executor, function, args, configs)
+        indices = {x: i for i, x in enumerate(futures)}
+        for future in as_completed(futures):
+            yield indices[future], future.result()
+    finally:
+        # Pending calls are cancelled if the generator is closed early
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
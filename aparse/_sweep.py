@@ -0,0 +1,107 @@
+import itertools
+from argparse import ArgumentTypeError
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from .core import Parameter
+from ._lib import compile_plan
+from ._lib import handle_before_parse as _handle_before_parse
+from ._binder import get_binder as _get_binder
+from .utils import merge_parameter_trees
+
+
+class SweepValues(tuple):
+    '''
+    Values of a swept argument, obtained by splitting the argument on commas.
+    '''
+
+
+class _UnsweptDefault(str):
+    '''
+    String default of a swept argument. Argparse passes string defaults through the type,
+    but only the values given on the command line are split.
+    '''
+
+
+class SweepType:
+    '''
+    Argparse type splitting the argument on commas and converting and validating each value.
+    '''
+    def __init__(self, argument_type, choices=None):
+        self.argument_type = argument_type
+        self.choices = choices
+        self.__name__ = getattr(argument_type, '__name__', repr(argument_type))
+
+    def __call__(self, value):
+        if isinstance(value, _UnsweptDefault):
+            value = str(value)
+            return self.argument_type(value) if self.argument_type is not None else value
+        values = []
+        for x in value.split(','):
+            if self.argument_type is not None:
+                x = self.argument_type(x)
+            if self.choices is not None and x not in self.choices:
+                choices = ', '.join(map(repr, self.choices))
+                raise ArgumentTypeError(f'invalid choice: {x!r} (choose from {choices})')
+            values.append(x)
+        return SweepValues(values)
+
+    def __repr__(self):
+        return self.__name__
+
+
+def get_unsweepable_arguments(parameters: Parameter) -> Set[str]:
+    # Values parsed by handlers (e.g., lists) can contain commas themselves
+    plan = compile_plan(parameters)
+    return {name for name, converters in zip(plan.argument_names, plan.converters) if converters}
+
+
+def get_switch_names(parameters: Parameter) -> Optional[List[str]]:
+    '''
+    Returns the names of the arguments selecting conditional types, or None if the selected
+    types can depend on any argument.
+    '''
+    names = []
+    for param in parameters.enumerate_parameters():
+        if hasattr(param.type, '__conditional_fmap__'):
+            return None
+        if hasattr(param.type, '__conditional_map__'):
+            names.append(param.argument_name)
+    return names
+
+
+def sweep_parameters(parameters: Parameter, arguments: Dict[str, Any], ignore=None,
+                     before_parse: Optional[Callable] = None,
+                     after_parse: Optional[Callable[[Parameter, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None,
+                     num_shards: int = 1, shard_index: int = 0) -> Iterator[Dict[str, Any]]:
+    '''
+    Lazily binds all combinations of the swept arguments.
+    For each combination of the conditional types, only the arguments present in the selected
+    parameter tree are expanded. The combinations are enumerated in a fixed order and assigned
+    to the shards round-robin. Only the combinations of the selected shard are bound.
+    '''
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f'Invalid shard index {shard_index} for {num_shards} shards')
+    arguments = {k: v for k, v in arguments.items() if k != '_aparse_parameters'}
+    swept = {k: v for k, v in arguments.items() if isinstance(v, SweepValues)}
+    fixed = {k: v for k, v in arguments.items() if k not in swept}
+    callbacks = [before_parse] if before_parse is not None else None
+    switch_names = get_switch_names(parameters) if before_parse is None else None
+    if switch_names is None:
+        switch_names = list(swept.keys())
+    switch_names = [x for x in switch_names if x in swept]
+
+    index = 0
+    for switch_values in itertools.product(*[swept[x] for x in switch_names]):
+        switch_arguments = dict(fixed)
+        switch_arguments.update(zip(switch_names, switch_values))
+        tree = merge_parameter_trees(parameters, _handle_before_parse(None, parameters, switch_arguments, callbacks))
+        binder = _get_binder(tree, ignore)
+        names = [x for x in swept if x not in switch_arguments and x in binder.known_arguments]
+        for values in itertools.product(*[swept[x] for x in names]):
+            if index % num_shards == shard_index:
+                bound_arguments = dict(switch_arguments)
+                bound_arguments.update(zip(names, values))
+                kwargs, _ = binder(bound_arguments)
+                if after_parse is not None:
+                    kwargs = after_parse(binder.parameters, bound_arguments, kwargs)
+                yield kwargs
+            index += 1
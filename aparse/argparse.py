@@ -1,15 +1,24 @@
-from typing import Dict, Set, Any, Optional, Callable
-from functools import partial
+import itertools
+from typing import Dict, Set, Any, Optional, Callable, List
 from argparse import ArgumentParser, Namespace, Action
 from .core import Parameter, DefaultFactory, Runtime
 from ._lib import add_parameters as _add_parameters
-from ._lib import preprocess_parameter as _preprocess_parameter
+from ._lib import preprocess_parameters as _preprocess_parameters
 from ._lib import handle_before_parse as _handle_before_parse
 from ._lib import parse_arguments_manually as _parse_arguments_manually
-from ._lib import bind_parameters as _bind_parameters
+from ._binder import get_binder as _get_binder
+from ._batch import bind_many as _bind_many
+from ._parallel import map_function as _map_function
+from ._parallel import imap_function_unordered as _imap_function_unordered
+from ._sweep import SweepType, _UnsweptDefault, sweep_parameters as _sweep_parameters
+from ._sweep import get_switch_names as _get_switch_names
+from ._sweep import get_unsweepable_arguments as _get_unsweepable_arguments
 from .utils import _empty, merge_parameter_trees, prefix_parameter
 from .utils import ignore_parameters, get_parameters as _get_parameters
 from .utils import get_path as _get_path
+from ._cache import cached_parameters as _cached_parameters
+from ._handlers import precompile_variants as _precompile_variants
+from ._instrument import timed as _timed
 
 
 class ActionNoYes(Action):
@@ -25,12 +34,14 @@ class ActionNoYes(Action):
 
 
 class ArgparseRuntime(Runtime):
-    def __init__(self, parser, soft_defaults: bool = False, defaults=None):
+    def __init__(self, parser, soft_defaults: bool = False, defaults=None, sweep: bool = False):
         self.parser = parser
         self._before_parse_callbacks = []
+        self._unsweepable_arguments = set()
         if hasattr(parser, '_aparse_runtime'):
-            old_soft_defaults, old_defaults, self._before_parse_callbacks = parser._aparse_runtime
+            old_soft_defaults, old_defaults, self._before_parse_callbacks, old_sweep = parser._aparse_runtime
             assert old_soft_defaults == soft_defaults
+            assert old_sweep == sweep
             if defaults is not None:
                 old_defaults.update(defaults)
             defaults = old_defaults
@@ -38,26 +49,29 @@ class ArgparseRuntime(Runtime):
             self.parser = self._hack_argparse(self.parser)
         self.soft_defaults = soft_defaults
         self.defaults = defaults or dict()
+        self.sweep = sweep
         self._save()
 
     def _save(self):
-        setattr(self.parser, '_aparse_runtime', (self.soft_defaults, self.defaults, self._before_parse_callbacks))
+        setattr(self.parser, '_aparse_runtime', (self.soft_defaults, self.defaults, self._before_parse_callbacks, self.sweep))
 
     def register_before_parse_callback(self, callback):
         self._before_parse_callbacks.append(callback)
 
     def _hack_argparse(self, parser):
-        super_parse_known_args = parser.parse_known_args
+        super_parse_known_args = _timed('parse_args')(parser.parse_known_args)
 
         def hacked_parse_known_args(args=None, namespace=None):
             defaults = dict(**self.defaults) if self.defaults is not None else dict()
             kwargs = _parse_arguments_manually(args, defaults)
             old_params = getattr(parser, '_aparse_parameters')
             callbacks = list(self._before_parse_callbacks)
-            new_parameters = _handle_before_parse(self, old_params, kwargs, callbacks)
-            if new_parameters is not None:
-                self.add_parameters(new_parameters)
-            setattr(parser, '_aparse_parameters', merge_parameter_trees(old_params, new_parameters))
+            if self.sweep:
+                self._add_swept_parameters(old_params, kwargs, callbacks)
+                # The conditional types are selected for each combination when sweeping
+                setattr(parser, '_aparse_parameters', old_params)
+            else:
+                self.add_selected_parameters(kwargs, callbacks)
             result = super_parse_known_args(args, namespace)
             setattr(result[0], '_aparse_parameters', getattr(parser, '_aparse_parameters', None))
             return result
@@ -65,16 +79,50 @@ class ArgparseRuntime(Runtime):
         setattr(parser, 'parse_known_args', hacked_parse_known_args)
         return parser
 
+    def add_selected_parameters(self, kwargs: Dict[str, Any], callbacks=None):
+        # Adds the parameters selected by the raw argument values (e.g., ConditionalType variants)
+        old_params = getattr(self.parser, '_aparse_parameters')
+        if callbacks is None:
+            callbacks = list(self._before_parse_callbacks)
+        new_parameters = _handle_before_parse(self, old_params, kwargs, callbacks)
+        if new_parameters is not None:
+            self.add_parameters(new_parameters)
+        setattr(self.parser, '_aparse_parameters', merge_parameter_trees(old_params, new_parameters))
+
+    def _add_swept_parameters(self, parameters, kwargs, callbacks):
+        # Parameters of all conditional types selected by any of the swept values are added
+        switch_names = _get_switch_names(parameters) or []
+        switch_names = [x for x in switch_names if isinstance(kwargs.get(x), str) and ',' in kwargs[x]]
+        for values in itertools.product(*[kwargs[x].split(',') for x in switch_names]):
+            switch_kwargs = dict(kwargs)
+            switch_kwargs.update(zip(switch_names, values))
+            new_parameters = _handle_before_parse(self, parameters, switch_kwargs, callbacks)
+            if new_parameters is not None:
+                self.add_parameters(new_parameters)
+
+    def _get_action_index(self) -> Dict[str, List[Action]]:
+        # The dest -> actions index is stored on the parser and extended
+        # incrementally with actions added since the last lookup (including
+        # actions added by the user). It is rebuilt if actions were removed.
+        index, size, last_action = getattr(self.parser, '_aparse_action_index', (None, 0, None))
+        actions = self.parser._actions
+        if index is None or len(actions) < size or (size > 0 and actions[size - 1] is not last_action):
+            index, size = dict(), 0
+        for action in actions[size:]:
+            index.setdefault(action.dest, []).append(action)
+        setattr(self.parser, '_aparse_action_index', (index, len(actions), actions[-1] if actions else None))
+        return index
+
+    def _find_action(self, dest: str) -> Optional[Action]:
+        actions = self._get_action_index().get(dest)
+        return actions[0] if actions else None
+
     def add_parameter(self, argument_name, argument_type, required=True,
                       help='', default=_empty, choices=None):
 
         full_argument_name = argument_name
         argument_name = argument_name.split('/', 1)[0]
-        existing_action = None
-        for action in self.parser._actions:
-            if action.dest == argument_name:
-                existing_action = action
-                break
+        existing_action = self._find_action(argument_name)
 
         params = []
         if default != _empty:
@@ -83,15 +131,27 @@ class ArgparseRuntime(Runtime):
             params.append('required')
         help = f'{help} [{", ".join(params)}]' if len(params) > 0 else help
 
+        arg_type = argument_type
+        if self.sweep and arg_type != bool and argument_name not in self._unsweepable_arguments:
+            # Choices are validated for each of the comma-separated values
+            arg_type, choices = SweepType(arg_type, choices), None
+            if isinstance(default, str):
+                default = _UnsweptDefault(default)
+
         # Find existing action
         if existing_action is not None:
             # We will update default
             existing_action.required = required
             existing_action.help = help
             existing_action.choices = choices
-            self.parser.set_defaults(**{argument_name: default if default != _empty else None})
+            if isinstance(existing_action.type, SweepType):
+                existing_action.type = arg_type
+            # Same as parser.set_defaults, but without scanning all actions
+            default = default if default != _empty else None
+            self.parser._defaults[argument_name] = default
+            for action in self._get_action_index()[argument_name]:
+                action.default = default
         else:
-            arg_type = argument_type
             arg_name = full_argument_name.replace('_', '-')
             if arg_type == bool:
                 assert '/' in arg_name
@@ -111,10 +171,8 @@ class ArgparseRuntime(Runtime):
             if param.name is None or param.type is None or len(param.children) > 0:
                 return param.replace(children=children)
 
-            for existing_action in self.parser._actions:
-                if existing_action.dest == param.argument_name:
-                    break
-            else:
+            existing_action = self._find_action(param.argument_name)
+            if existing_action is None:
                 return param.replace(children=children)
 
             default = existing_action.default
@@ -123,6 +181,8 @@ class ArgparseRuntime(Runtime):
                 default_factory = None
             argument_type = existing_action.type
             choices = existing_action.choices
+            if isinstance(argument_type, SweepType):
+                argument_type, choices = argument_type.argument_type, argument_type.choices
             return param.replace(choices=choices, default_factory=default_factory,
                                  argument_type=argument_type, children=children)
         return parameters.walk(map)
@@ -132,13 +192,16 @@ class ArgparseRuntime(Runtime):
         setattr(self.parser, '_aparse_parameters', merge_parameter_trees(getattr(self.parser, '_aparse_parameters', None), parameters))
 
         # Add parameters
+        if self.sweep:
+            self._unsweepable_arguments = _get_unsweepable_arguments(parameters)
         _add_parameters(parameters, runtime=self, soft_defaults=self.soft_defaults, defaults=self.defaults)
 
 
 def _add_argparse_arguments(parameters: Parameter, parser: ArgumentParser,
                             defaults: Dict[str, Any] = None, prefix: str = None,
-                            ignore: Optional[Set[str]] = None, soft_defaults: bool = False, _before_parse=None):
-    runtime = ArgparseRuntime(parser, soft_defaults=soft_defaults, defaults=defaults)
+                            ignore: Optional[Set[str]] = None, soft_defaults: bool = False, sweep: bool = False,
+                            _before_parse=None):
+    runtime = ArgparseRuntime(parser, soft_defaults=soft_defaults, defaults=defaults, sweep=sweep)
     if prefix is not None:
         parameters = prefix_parameter(parameters, prefix, dict)
     if ignore is not None:
@@ -151,57 +214,129 @@ def _add_argparse_arguments(parameters: Parameter, parser: ArgumentParser,
 
 def _bind_argparse_arguments(
         parameters: Parameter, argparse_args, ignore=None,
-        after_parse: Optional[Callable[[Parameter, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None):
+        after_parse: Optional[Callable[[Parameter, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None,
+        lazy: bool = False):
     args_dict = argparse_args.__dict__
     if '_aparse_parameters' in args_dict:
         args_dict = {k: v for k, v in args_dict.items()}
         parameters = args_dict.pop('_aparse_parameters')
 
-    if ignore is not None:
-        parameters = parameters.walk(lambda x, children:
-                                     x.replace(children=children) if x.full_name not in ignore else None)
-
-    kwargs, _ = _bind_parameters(parameters, args_dict)
+    # The binder is compiled once per parameter tree, set of ignored parameters and mode
+    binder = _get_binder(parameters, ignore, lazy)
+    kwargs, _ = binder(args_dict)
     if after_parse is not None:
-        kwargs = after_parse(parameters, args_dict, kwargs)
+        kwargs = after_parse(binder.parameters, args_dict, kwargs)
     return kwargs
 
 
-def _from_argparse_arguments(parameters: Parameter, function, argparse_args, *args, _ignore=None, _prefix: str = None, _after_parse=None, **kwargs):
-    new_kwargs = _bind_argparse_arguments(parameters, argparse_args, ignore=set(kwargs.keys()).union(_ignore or []), after_parse=_after_parse)
+def _from_argparse_arguments(parameters: Parameter, function, argparse_args, *args, _ignore=None, _prefix: str = None, _after_parse=None,
+                             _lazy: bool = False, **kwargs):
+    new_kwargs = _bind_argparse_arguments(parameters, argparse_args, ignore=set(kwargs.keys()).union(_ignore or []), after_parse=_after_parse,
+                                          lazy=_lazy)
     if _prefix is not None:
         new_kwargs = _get_path(new_kwargs, _prefix)
     new_kwargs.update(kwargs)
     return function(*args, **new_kwargs)
 
 
+def _sweep_argparse_arguments(parameters: Parameter, argparse_args, ignore=None, num_shards: int = 1, shard_index: int = 0,
+                              _before_parse=None, _after_parse=None):
+    args_dict = argparse_args.__dict__
+    if '_aparse_parameters' in args_dict:
+        parameters = args_dict['_aparse_parameters']
+    return _sweep_parameters(parameters, args_dict, ignore=ignore, before_parse=_before_parse, after_parse=_after_parse,
+                             num_shards=num_shards, shard_index=shard_index)
+
+
+def _map_from_argparse_arguments(parameters: Parameter, function, configs, *args, executor=None,
+                                 max_workers: Optional[int] = None, as_completed: bool = False,
+                                 _ignore=None, _prefix: str = None, _after_parse=None, **kwargs):
+    ignore = set(kwargs.keys()).union(_ignore or [])
+
+    def bind(config):
+        # Namespaces are bound in the parent process, dictionaries are already bound kwargs
+        if isinstance(config, Namespace):
+            new_kwargs = _bind_argparse_arguments(parameters, config, ignore=ignore, after_parse=_after_parse)
+            if _prefix is not None:
+                new_kwargs = _get_path(new_kwargs, _prefix)
+        else:
+            new_kwargs = dict(config)
+        new_kwargs.update(kwargs)
+        return new_kwargs
+
+    configs = map(bind, configs)
+    if as_completed:
+        return _imap_function_unordered(function, configs, args, executor=executor, max_workers=max_workers)
+    return _map_function(function, configs, args, executor=executor, max_workers=max_workers)
+
+
+def _from_rows(parameters: Parameter, function, data, *args, _ignore=None, _before_parse=None, _after_parse=None, **kwargs):
+    rows = _bind_many(parameters, data, ignore=set(kwargs.keys()).union(_ignore or []),
+                      before_parse=_before_parse, after_parse=_after_parse)
+    return [function(*args, **dict(row, **kwargs)) for row in rows]
+
+
 def add_argparse_arguments(
         _fn=None, *,
         ignore: Set[str] = None,
         before_parse: Callable[[ArgumentParser, Dict[str, Any]], ArgumentParser] = None,
-        after_parse: Callable[[Namespace, Dict[str, Any]], Dict[str, Any]] = None):
+        after_parse: Callable[[Namespace, Dict[str, Any]], Dict[str, Any]] = None,
+        precompile: bool = False):
     '''
-    Extends function or class with "add_argparse_arguments", "from_argparse_arguments", and "bind_argparse_arguments" methods.
+    Extends function or class with "add_argparse_arguments", "from_argparse_arguments", "bind_argparse_arguments",
+    "map_from_argparse_arguments", "sweep_argparse_arguments", "bind_many", and "from_rows" methods.
     "add_argparse_arguments" adds arguments to the argparse.ArgumentParser instance.
     "from_argparse_arguments" takes the argparse.Namespace instance obtained by calling parse.parse_args(), parses them and calls
         original function or constructs the class
     "bind_argparse_arguments" just parses the arguments into a kwargs dictionary, but does not call the original function. Instead,
-        the parameters are returned.
+        the parameters are returned. With "lazy=True" ("_lazy=True" for "from_argparse_arguments"), the nested dataclasses
+        are returned as proxies, which convert the values and construct the dataclasses when they are first accessed.
+    "map_from_argparse_arguments" calls the original function for many argparse.Namespace instances (or bound kwargs)
+        in parallel using a process pool and returns the results in the input order.
+    "sweep_argparse_arguments" lazily binds all combinations of the comma-separated values of arguments
+        added with "add_argparse_arguments(parser, sweep=True)".
+    "bind_many" binds each row of columnar data (a CSV file, a dictionary of lists, or a NumPy structured array)
+        into a kwargs dictionary and "from_rows" calls the original function for each row.
 
     Arguments:
         ignore: Set of parameters to ignore when inspecting the function signature
         before_parse: Callback to be called before parser.parse_args()
         after_parse: Callback to be called before "from_argparse_arguments" calls the function and updates the kwargs.
+        precompile: Build the parameters and all ConditionalType variants when decorating instead of on the first use
+            and when parsing.
 
     Returns: The original function extended with other functions.
     '''
     def wrap(fn):
-        parameters = _get_parameters(fn).walk(_preprocess_parameter)
-        if ignore is not None:
-            parameters = ignore_parameters(parameters, ignore)
-        setattr(fn, 'add_argparse_arguments', partial(_add_argparse_arguments, parameters, _before_parse=before_parse))
-        setattr(fn, 'from_argparse_arguments', partial(_from_argparse_arguments, parameters, fn, _after_parse=after_parse))
-        setattr(fn, 'bind_argparse_arguments', partial(_bind_argparse_arguments, parameters, after_parse=after_parse))
+        parameters = None
+
+        def get_parameters():
+            # The tree is built on the first use, most decorated objects are never used in a given run
+            nonlocal parameters
+            if parameters is None:
+                tree = _cached_parameters(fn, lambda: _preprocess_parameters(_get_parameters(fn)))
+                if ignore is not None:
+                    tree = ignore_parameters(tree, ignore)
+                parameters = tree
+            return parameters
+
+        def with_parameters(function, *args, **kwargs):
+            def call(*call_args, **call_kwargs):
+                return function(get_parameters(), *args, *call_args, **dict(kwargs, **call_kwargs))
+            return call
+
+        setattr(fn, 'add_argparse_arguments', with_parameters(_add_argparse_arguments, _before_parse=before_parse))
+        setattr(fn, 'from_argparse_arguments', with_parameters(_from_argparse_arguments, fn, _after_parse=after_parse))
+        setattr(fn, 'bind_argparse_arguments', with_parameters(_bind_argparse_arguments, after_parse=after_parse))
+        setattr(fn, 'map_from_argparse_arguments', with_parameters(_map_from_argparse_arguments, fn, _after_parse=after_parse))
+        setattr(fn, 'sweep_argparse_arguments', with_parameters(_sweep_argparse_arguments,
+                                                                _before_parse=before_parse, _after_parse=after_parse))
+        setattr(fn, 'bind_many', with_parameters(_bind_many, before_parse=before_parse, after_parse=after_parse))
+        setattr(fn, 'from_rows', with_parameters(_from_rows, fn, _before_parse=before_parse, _after_parse=after_parse))
+        # The tree (without the ignored parameters) is reused by the completion index
+        setattr(fn, '__aparse_parameters__', get_parameters)
+        if precompile:
+            _precompile_variants(get_parameters())
         return fn
 
     if _fn is not None:
@@ -1,6 +1,7 @@
+import inspect
 import click
 from aparse.core import Parameter, Runtime, DefaultFactory
-from aparse._lib import preprocess_parameter as _preprocess_parameter
+from aparse._lib import preprocess_parameters as _preprocess_parameters
 from aparse._lib import add_parameters as _add_parameters
 from aparse._lib import handle_before_parse as _handle_before_parse
 from aparse._lib import parse_arguments_manually as _parse_arguments_manually
@@ -8,6 +9,7 @@ from aparse._lib import bind_parameters as _bind_parameters
 from aparse._lib import handle_after_parse as _handle_after_parse
 from aparse.utils import _empty, get_parameters as _get_parameters
 from aparse.utils import merge_parameter_trees, ignore_parameters
+from aparse._cache import cached_parameters as _cached_parameters
 # from click import *  # noqa: F403, F401
 
 
@@ -20,22 +22,37 @@ class ClickRuntime(Runtime):
         self.soft_defaults = soft_defaults
         self._parameters = None
         self._after_parse_callbacks = []
+        self._pending_options = None
 
     def add_parameter(self, argument_name, argument_type, required=True,
                       help='', default=_empty, choices=None):
         if choices is not None:
             argument_type = click.Choice(choices, case_sensitive=True)
         if argument_type is not None:
-            params = self._get_params()
-            existing_action = {x.name: x for x in params}.get(argument_name, None)
-            if existing_action is not None:
-                params.remove(existing_action)
-
             opt_argument_name = '/'.join(f'--{x}' for x in argument_name.replace('_', '-').split('/'))
-            self.fn = click.option(opt_argument_name, type=argument_type,
-                                   required=required, default=default if default != _empty else None,
-                                   show_default=default != _empty, help=help,
-                                   show_choices=choices is not None)(self.fn)
+            # Same as click.option, but the option is attached later together with the others
+            option = click.Option((opt_argument_name,), type=argument_type,
+                                  required=required, default=default if default != _empty else None,
+                                  show_default=default != _empty,
+                                  help=inspect.cleandoc(help) if help is not None else None,
+                                  show_choices=choices is not None)
+            if self._pending_options is None:
+                self._attach_options([option])
+            else:
+                # Later options replace earlier ones with the same name
+                self._pending_options.pop(option.name, None)
+                self._pending_options[option.name] = option
+
+    def _attach_options(self, options):
+        if isinstance(self.fn, click.Command):
+            params = self.fn.params
+        else:
+            if not hasattr(self.fn, '__click_params__'):
+                self.fn.__click_params__ = []
+            params = self.fn.__click_params__
+        names = set(x.name for x in options)
+        params[:] = [x for x in params if x.name not in names]
+        params.extend(options)
 
     def _get_params(self):
         return getattr(self.fn, 'params', getattr(self.fn, '__click_params__', []))
@@ -81,7 +98,13 @@ class ClickRuntime(Runtime):
         return parameters.walk(map)
 
     def add_parameters(self, parameters: Parameter):
-        _add_parameters(parameters, self, soft_defaults=self.soft_defaults)
+        # All options are collected first and attached to the function at once
+        self._pending_options = dict()
+        try:
+            _add_parameters(parameters, self, soft_defaults=self.soft_defaults)
+            self._attach_options(list(self._pending_options.values()))
+        finally:
+            self._pending_options = None
 
         if self._parameters is not None:
             parameters = merge_parameter_trees(self._parameters, parameters)
@@ -110,7 +133,7 @@ def command(name=None, cls=None, before_parse=None, after_parse=None, soft_defau
     _wrap = click.command(name=name, cls=cls, **kwargs)
 
     def wrap(fn):
-        root_param = _get_parameters(fn).walk(_preprocess_parameter)
+        root_param = _cached_parameters(fn, lambda: _preprocess_parameters(_get_parameters(fn)))
         if ignore is not None:
             root_param = ignore_parameters(root_param, ignore)
         runtime = ClickRuntime(fn, soft_defaults=soft_defaults)
@@ -127,6 +150,8 @@ def command(name=None, cls=None, before_parse=None, after_parse=None, soft_defau
 
         fn = runtime.fn
         fn = _wrap(fn)
+        # The tree (without the ignored parameters) is reused by the completion index
+        setattr(fn, '__aparse_parameters__', lambda: root_param)
         return fn
 
     return wrap
@@ -0,0 +1,240 @@
+'''
+Shell completion from a precomputed index.
+The index is a JSON file listing the options of a CLI built with aparse (argparse or click),
+including the choices, defaults and help of the arguments and the options of each ConditionalType variant.
+It is built once, e.g.:
+
+    python -m aparse.completion build train:main train-completion.json --prog train.py
+    python -m aparse.completion bash train-completion.json >> ~/.bash_completion
+
+Completing from the index (python -m aparse.completion complete INDEX -- WORDS...) does not import
+the program nor the aparse backends.
+'''
+import sys
+import json
+from typing import Any, Dict, List, Optional, Set
+
+
+_INDEX_FORMAT = 1
+
+
+def _option_name(argument_name: str) -> str:
+    return '--' + argument_name.replace('_', '-')
+
+
+def _to_json(value):
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+def _collect_options(parameters) -> Dict[str, Dict[str, Any]]:
+    from .core import Runtime, _empty
+    from ._lib import add_parameters
+
+    options: Dict[str, Dict[str, Any]] = dict()
+
+    class IndexRuntime(Runtime):
+        def add_parameter(self, argument_name, argument_type, required=True,
+                          help='', default=_empty, choices=None):
+            info = dict(
+                required=required, help=help or None,
+                default=None if default is _empty else _to_json(default))
+            if argument_type == bool:
+                # Flags are added as "name/no_name"
+                for name in argument_name.split('/'):
+                    options[_option_name(name)] = dict(info, flag=True)
+            else:
+                options[_option_name(argument_name)] = dict(
+                    info, flag=False, choices=[str(x) for x in choices] if choices is not None else None)
+
+        def read_defaults(self, parameters):
+            return parameters
+
+    add_parameters(parameters, IndexRuntime(), soft_defaults=True)
+    return options
+
+
+def build_completion_index(obj: Any, prog: Optional[str] = None, ignore: Optional[Set[str]] = None) -> Dict[str, Any]:
+    '''
+    Builds the completion index of a function or class (or a command created by aparse.click.command).
+    All ConditionalType variants are resolved, which imports the variants declared as strings.
+
+    Arguments:
+        obj: Function, class, or click command
+        prog: Name of the program, which is completed by the shell
+        ignore: Set of parameters to ignore when inspecting the function signature,
+            in addition to the parameters ignored by add_argparse_arguments or aparse.click.command
+
+    Returns: Dictionary, which can be stored as JSON.
+    '''
+    from .core import resolve_variant
+    from .utils import get_parameters, ignore_parameters, merge_parameter_trees
+    from ._lib import preprocess_parameters
+    from ._handlers import ConditionalTypeHandler, _get_variant_parameter
+
+    # The objects decorated by add_argparse_arguments and the commands created by aparse.click.command
+    # keep their tree (without the ignored parameters), other commands keep the function as the callback
+    get_tree = getattr(obj, '__dict__', dict()).get('__aparse_parameters__')
+    if get_tree is not None:
+        parameters = get_tree()
+    else:
+        if hasattr(obj, 'callback') and hasattr(obj, 'params'):
+            obj = obj.callback
+        parameters = preprocess_parameters(get_parameters(obj))
+    if ignore is not None:
+        parameters = ignore_parameters(parameters, ignore)
+
+    # The variants can contain conditional types themselves, their options are
+    # completed when the variants containing them are selected
+    conditional: Dict[str, Dict[str, Any]] = dict()
+    trees = [(parameters, None)]
+    while trees:
+        tree, parent = trees.pop(0)
+        for param in tree.enumerate_parameters():
+            option = _option_name(param.argument_name) if param.argument_name is not None else None
+            if not ConditionalTypeHandler._does_handle(param.type) or option in conditional:
+                continue
+            variants: Dict[str, Dict[str, Any]] = dict()
+            default = getattr(param.type, '__conditional_default__', None)
+            conditional[option] = dict(
+                default=str(default) if default is not None else None, variants=variants, parent=parent)
+            for key, tp in param.type.__conditional_map__.items():
+                variant = None
+                if tp is not None:
+                    variant = merge_parameter_trees(_get_variant_parameter(param, resolve_variant(tp)))
+                    trees.append((variant, [option, str(key)]))
+                variants[str(key)] = _collect_options(variant) if variant is not None else dict()
+    options = _collect_options(parameters)
+    options['--help'] = dict(flag=True, required=False, help='show this help message and exit', default=None)
+    return dict(format=_INDEX_FORMAT, prog=prog, options=options, conditional=conditional)
+
+
+def write_completion_index(obj: Any, path: str, prog: Optional[str] = None, ignore: Optional[Set[str]] = None):
+    '''
+    Builds the completion index (see build_completion_index) and stores it as JSON.
+    '''
+    index = build_completion_index(obj, prog=prog, ignore=ignore)
+    with open(path, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+
+
+def load_completion_index(path: str) -> Dict[str, Any]:
+    with open(path, 'r') as f:
+        index = json.load(f)
+    if index.get('format') != _INDEX_FORMAT:
+        raise ValueError(f'Unsupported completion index format {index.get("format")}, the index has to be rebuilt')
+    return index
+
+
+def complete(index: Dict[str, Any], words: List[str]) -> List[str]:
+    '''
+    Returns the completions of the last word.
+
+    Arguments:
+        index: Completion index returned by build_completion_index
+        words: Words of the command line after the program name, up to and including the word being completed
+
+    Returns: Sorted list of the completions.
+    '''
+    words = list(words) or ['']
+    current, previous = words[-1], words[:-1]
+    # Bash splits "--name=value" into "--name", "=", and "value"
+    if len(previous) >= 2 and previous[-1] == '=':
+        previous = previous[:-2] + [f'{previous[-2]}=']
+
+    # Options of the selected (or default) variants of the conditional types
+    selected = {k: v['default'] for k, v in index['conditional'].items()}
+    for i, word in enumerate(previous):
+        name, _, value = word.partition('=')
+        if name in selected:
+            if not value and i + 1 < len(previous):
+                value = previous[i + 1]
+            selected[name] = value
+    options = dict(index['options'])
+    active = set()
+    # The conditional types in variants follow the conditional types containing them
+    for name, conditional in index['conditional'].items():
+        parent = conditional.get('parent')
+        if parent is not None and (parent[0] not in active or selected[parent[0]] != parent[1]):
+            continue
+        active.add(name)
+        options.update(conditional['variants'].get(selected[name], {}))
+
+    value_prefix = ''
+    option_name = None
+    if current.startswith('--') and '=' in current:
+        option_name, _, current = current.partition('=')
+        value_prefix = option_name + '='
+    elif previous and previous[-1].endswith('='):
+        option_name = previous[-1][:-1]
+    elif previous and previous[-1].startswith('--'):
+        option_name = previous[-1]
+    option = options.get(option_name) if option_name is not None else None
+
+    if option is not None and not option['flag']:
+        choices = option.get('choices') or []
+        return sorted(value_prefix + x for x in choices if x.startswith(current))
+    if value_prefix or not (current == '' or current.startswith('-')):
+        return []
+    return sorted(x for x in options if x.startswith(current))
+
+
+def bash_completion_script(index_path: str, prog: Optional[str] = None) -> str:
+    '''
+    Returns the bash script registering the completion of the program from the index.
+    '''
+    import os
+    import re
+    import shlex
+
+    if prog is None:
+        prog = load_completion_index(index_path)['prog']
+    if not prog:
+        raise ValueError('The program name is not stored in the index and has to be passed')
+    function_name = '_aparse_complete_' + re.sub(r'\W', '_', os.path.basename(prog))
+    command = ' '.join(shlex.quote(x) for x in [sys.executable, '-m', 'aparse.completion', 'complete', os.path.abspath(index_path)])
+    return '\n'.join([
+        f'{function_name}() {{',
+        '    local IFS=$\'\\n\'',
+        f'    COMPREPLY=($({command} -- "${{COMP_WORDS[@]:1:COMP_CWORD}}"))',
+        '}',
+        f'complete -o default -F {function_name} {shlex.quote(prog)}',
+        '',
+    ])
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m aparse.completion', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    build = commands.add_parser('build', help='build the completion index of "package.module:function"')
+    build.add_argument('object')
+    build.add_argument('index')
+    build.add_argument('--prog')
+    build.add_argument('--ignore', nargs='+')
+    complete_parser = commands.add_parser('complete', help='print the completions of the last word')
+    complete_parser.add_argument('index')
+    complete_parser.add_argument('words', nargs='*')
+    bash = commands.add_parser('bash', help='print the bash completion script')
+    bash.add_argument('index')
+    bash.add_argument('--prog')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        from .core import import_object
+
+        write_completion_index(import_object(args.object), args.index, prog=args.prog,
+                               ignore=set(args.ignore) if args.ignore else None)
+    elif args.command == 'complete':
+        for x in complete(load_completion_index(args.index), args.words):
+            print(x)
+    else:
+        sys.stdout.write(bash_completion_script(args.index, prog=args.prog))
+
+
+if __name__ == '__main__':
+    main()
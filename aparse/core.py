@@ -1,11 +1,9 @@
-import typing
-import json
 import copy
+import typing
 import inspect
 import sys
-import dataclasses
 from collections import OrderedDict
-from typing import Any, NewType, Dict, Union, Callable, List, Tuple, Optional, Type
+from typing import Any, NewType, Dict, Union, Callable, Iterable, List, Tuple, Optional, Type
 try:
     from typing import Literal  # type: ignore
 except(ImportError):
@@ -35,30 +33,68 @@ AllArguments = NewType('AllArguments', Dict[str, Any])
 _empty = object()
 
 
+class _ConstantFactory:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+
 class DefaultFactory:
+    """Factory of the default value of a parameter.
+    The value used for the representation and the comparisons is materialised once and never returned,
+    calls still return a new value (unless it is immutable).
+    """
+    __slots__ = ('factory', '_comp_value_fn', '_value', '_comp_value')
+
     def __init__(self, factory, comp_value_fn=None):
         self.factory = factory
         self._comp_value_fn = comp_value_fn
+        self._value = _empty
+        self._comp_value = _empty
+
+    def __reduce__(self):
+        return DefaultFactory, (self.factory, self._comp_value_fn)
+
+    def _get_value(self):
+        value = self._value
+        if value is _empty:
+            value = self._value = self.factory()
+        return value
 
     def __repr__(self):
-        return repr(self.factory())
+        return repr(self._get_value())
 
     def __str__(self):
-        return str(self.factory())
+        return str(self._get_value())
 
     def __call__(self):
+        value = self._get_value()
+        if isinstance(value, (int, str, float, bool)) or value is None:
+            return value
         return self.factory()
 
     def __eq__(self, other):
         if not isinstance(other, DefaultFactory):
-            return self._get_comp_value(self) == other
-        return self._get_comp_value(self) == self._get_comp_value(other)
+            return self._get_own_comp_value() == other
+        if other._comp_value_fn is self._comp_value_fn:
+            return self._get_own_comp_value() == other._get_own_comp_value()
+        return self._get_own_comp_value() == self._get_comp_value(other)
+
+    def _get_own_comp_value(self):
+        comp_value = self._comp_value
+        if comp_value is _empty:
+            comp_value = self._comp_value = self._get_comp_value(self)
+        return comp_value
 
     def _get_comp_value(self, value):
         if self._comp_value_fn is not None:
             return self._comp_value_fn(value)
         if isinstance(value, DefaultFactory):
-            value = value()
+            value = value._get_value()
         if isinstance(value, (int, str, float, bool)):
             return str(value)
         if value is None:
@@ -70,10 +106,10 @@ class DefaultFactory:
         return self._get_comp_value(vars(value))
 
     def __hash__(self):
-        return hash(self._get_comp_value(self))
+        return hash(self._get_own_comp_value())
 
     def get_default(self):
-        value = self()
+        value = self._get_value()
         if isinstance(value, (int, str, float, bool)):
             return value
         return self
@@ -84,56 +120,112 @@ class DefaultFactory:
             return value
         if value == _empty or value == inspect._empty:
             return None
-        return DefaultFactory(lambda: value)
+        return DefaultFactory(_ConstantFactory(value))
+
+
+_parameter_fields = ('name', 'type', 'help', 'children', 'default_factory', 'choices',
+                     'argument_type', '_argument_name', 'is_container')
 
 
-@dataclasses.dataclass
 class Parameter:
+    """Immutable node of the parameter tree.
+    The children are stored in a tuple and new nodes are created with `replace`.
+    """
+    __slots__ = _parameter_fields + ('_child_index', '_plans', '_binders', '__weakref__')
+
     name: Optional[str]
     type: Optional[Type]
-    help: str = ''
-    children: List['Parameter'] = dataclasses.field(default_factory=list, repr=False)
-    default_factory: Optional[Callable[[], Any]] = None
-    choices: Optional[List[Any]] = None
-    argument_type: Optional[Any] = None
-    _argument_name: Optional[Tuple[str]] = None
-    is_container: Optional[bool] = None
+    help: str
+    children: Tuple['Parameter', ...]
+    default_factory: Optional[Callable[[], Any]]
+    choices: Optional[List[Any]]
+    argument_type: Optional[Any]
+    _argument_name: Optional[Tuple[str]]
+    is_container: Optional[bool]
+
+    def __init__(self, name: Optional[str], type: Optional[Type], help: str = '',
+                 children: Iterable['Parameter'] = (),
+                 default_factory: Optional[Callable[[], Any]] = None,
+                 choices: Optional[List[Any]] = None,
+                 argument_type: Optional[Any] = None,
+                 _argument_name: Optional[Tuple[str]] = None,
+                 is_container: Optional[bool] = None):
+        init = object.__setattr__
+        init(self, 'name', name)
+        init(self, 'type', type)
+        init(self, 'help', help)
+        init(self, 'children', tuple(children))
+        init(self, 'default_factory', default_factory)
+        init(self, 'choices', choices)
+        init(self, 'argument_type', argument_type)
+        init(self, '_argument_name', _argument_name)
+        init(self, 'is_container', is_container)
+        init(self, '_child_index', None)
+        init(self, '_plans', None)
+        init(self, '_binders', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable, use replace() instead')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable, use replace() instead')
+
+    def __reduce__(self):
+        return Parameter, tuple(getattr(self, x) for x in _parameter_fields)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, x) == getattr(other, x) for x in _parameter_fields)
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        fields = ', '.join(f'{x}={getattr(self, x)!r}' for x in _parameter_fields if x != 'children')
+        return f'{type(self).__name__}({fields})'
 
     def walk(self, fn: Callable[['ParameterWithPath', List[Any]], Any], reverse: bool = False):
-        def _walk(e, parent):
-            e = ParameterWithPath(e, parent)
-            new_children = []
-            children = e.children
+        # Iterative post-order traversal. Entries are (path, None) for a node to expand,
+        # or (path, results) once its children were pushed and their results are collected.
+        root_results: List[Any] = []
+        stack: List[Tuple[ParameterWithPath, Optional[List[Any]], List[Any]]] = [
+            (ParameterWithPath(self, None), None, root_results)]
+        while stack:
+            e, results, parent_results = stack.pop()
+            if results is None:
+                results = []
+                stack.append((e, results, parent_results))
+                children = e.children
+                if not reverse:
+                    children = reversed(children)
+                for p in children:
+                    stack.append((ParameterWithPath(p, e), None, results))
+                continue
             if reverse:
-                children = reversed(children)
-            for p in children:
-                result = _walk(p, e)
-                if result is not None:
-                    if isinstance(result, ParameterWithPath):
-                        result = result.parameter
-                    new_children.append(result)
-            if reverse:
-                new_children = list(reversed(new_children))
-            return fn(e, children=new_children)
-        result = _walk(self, None)
-        if isinstance(result, ParameterWithPath):
-            return result.parameter
-        return result
+                results.reverse()
+            result = fn(e, children=results)
+            if result is not None:
+                if isinstance(result, ParameterWithPath):
+                    result = result.parameter
+                parent_results.append(result)
+        return root_results[0] if root_results else None
 
     def enumerate_parameters(self):
-        def _enumerate(e, parent):
-            e = ParameterWithPath(e, parent)
+        stack = [ParameterWithPath(self, None)]
+        while stack:
+            e = stack.pop()
             yield e
-            for x in e.children:
-                for y in _enumerate(x, e):
-                    yield y
-        return _enumerate(self, None)
+            for x in reversed(e.children):
+                stack.append(ParameterWithPath(x, e))
 
     def find(self, name: str) -> Optional['Parameter']:
-        for x in self.children:
-            if x.name == name:
-                return x
-        return None
+        index = self._child_index
+        if index is None:
+            index = dict()
+            for x in reversed(self.children):
+                index[x.name] = x
+            object.__setattr__(self, '_child_index', index)
+        return index.get(name)
 
     @property
     def default(self):
@@ -144,13 +236,50 @@ class Parameter:
         return self.default_factory()
 
     def replace(self, **kwargs):
-        return dataclasses.replace(self, **kwargs)
+        """Returns a node with the fields updated, or the node itself if no field changed.
+        The fields are compared by identity, the children element-wise."""
+        changed = False
+        for x in _parameter_fields:
+            if x not in kwargs:
+                kwargs[x] = getattr(self, x)
+            elif not changed:
+                value, current = kwargs[x], getattr(self, x)
+                if x == 'children':
+                    if not isinstance(value, (tuple, list)):
+                        value = kwargs[x] = tuple(value)
+                    changed = len(value) != len(current) or any(a is not b for a, b in zip(value, current))
+                else:
+                    changed = value is not current
+        if not changed:
+            return self
+        return Parameter(**kwargs)
+
+
+_unset = object()
 
 
-@dataclasses.dataclass
 class ParameterWithPath:
-    parameter: Parameter
-    parent: Optional['ParameterWithPath'] = dataclasses.field(repr=False, default=None)
+    """Parameter together with the path of its parents.
+    The names are computed once per path object, the parents are shared by the children.
+    """
+    __slots__ = ('parameter', 'parent', '_cached_full_name', '_cached_argument_name', '_found_children')
+
+    def __init__(self, parameter: Parameter, parent: Optional['ParameterWithPath'] = None):
+        self.parameter = parameter
+        self.parent = parent
+        self._cached_full_name = _unset
+        self._cached_argument_name = _unset
+        self._found_children: Optional[Dict[str, 'ParameterWithPath']] = None
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.parameter == other.parameter and self.parent == other.parent
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        return f'{type(self).__name__}(parameter={self.parameter!r})'
 
     @property
     def name(self):
@@ -186,26 +315,174 @@ class ParameterWithPath:
 
     @property
     def full_name(self):
-        if self.parent is not None and self.parent.name is not None:
-            return self.parent.full_name + '.' + self.name
-        return self.name
+        full_name = self._cached_full_name
+        if full_name is _unset:
+            # The names of the uncached parents are computed top-down to avoid deep recursion
+            for node in reversed(self._uncached_path('_cached_full_name')):
+                full_name = node.name
+                if node.parent is not None and node.parent.name is not None:
+                    full_name = node.parent._cached_full_name + '.' + full_name
+                node._cached_full_name = full_name
+        return full_name
+
+    def _uncached_path(self, attribute):
+        path = []
+        node = self
+        while node is not None and getattr(node, attribute) is _unset:
+            path.append(node)
+            node = node.parent
+        return path
 
     def find(self, name):
         child = self.parameter.find(name)
-        if child is not None:
-            return ParameterWithPath(child, self)
-        return None
+        if child is None:
+            return None
+        found_children = self._found_children
+        if found_children is None:
+            found_children = self._found_children = dict()
+        child_with_path = found_children.get(name)
+        if child_with_path is None:
+            child_with_path = found_children[name] = ParameterWithPath(child, self)
+        return child_with_path
 
     @property
     def argument_name(self):
-        if self.parameter._argument_name is not None:
-            return self.parameter._argument_name[0]
-        if self.parent is not None and self.parent.argument_name is not None:
-            return self.parent.argument_name + '_' + self.name
-        return self.name
+        argument_name = self._cached_argument_name
+        if argument_name is _unset:
+            for node in reversed(self._uncached_path('_cached_argument_name')):
+                if node.parameter._argument_name is not None:
+                    argument_name = node.parameter._argument_name[0]
+                else:
+                    argument_name = node.name
+                    parent_argument_name = node.parent._cached_argument_name if node.parent is not None else None
+                    if parent_argument_name is not None:
+                        argument_name = parent_argument_name + '_' + argument_name
+                node._cached_argument_name = argument_name
+        return argument_name
 
     def replace(self, **kwargs):
-        return ParameterWithPath(self.parameter.replace(**kwargs), self.parent)
+        parameter = self.parameter.replace(**kwargs)
+        if parameter is self.parameter:
+            return self
+        return ParameterWithPath(parameter, self.parent)
+
+
+class ParameterPlan:
+    """Flat, pre-order representation of a parameter tree.
+
+    The tree is compiled once into arrays of nodes with precomputed names,
+    parent indices and handler chains, so that the individual pipeline
+    phases can be implemented as linear passes instead of repeated walks.
+    The handler chains are resolved by `dispatch(type, method_name)`.
+    """
+    def __init__(self, root: Parameter,
+                 dispatch: Optional[Callable[[Any, str], Tuple['Handler', ...]]] = None):
+        self.root = root
+        self.nodes: List[ParameterWithPath] = []
+        self.parents: List[int] = []
+        self.children: List[List[int]] = []
+        self.full_names: List[Optional[str]] = []
+        self.argument_names: List[Optional[str]] = []
+        self.adders: List[Tuple['Handler', ...]] = []
+        self.converters: List[Tuple['Handler', ...]] = []
+        self.binders: List[Tuple['Handler', ...]] = []
+        self.postorder: List[int] = []
+
+        # Entries are (parameter, parent index) to visit, or (None, index)
+        # for a node whose whole subtree was already visited.
+        stack: List[Tuple[Optional[Parameter], int]] = [(root, -1)]
+        while stack:
+            param, parent = stack.pop()
+            if param is None:
+                self.postorder.append(parent)
+                continue
+            index = len(self.nodes)
+            if parent >= 0:
+                parent_node = self.nodes[parent]
+                parent_full_name = self.full_names[parent]
+                parent_argument_name = self.argument_names[parent]
+                self.children[parent].append(index)
+            else:
+                parent_node = parent_full_name = parent_argument_name = None
+            if parent_node is not None and parent_node.name is not None:
+                full_name = parent_full_name + '.' + param.name
+            else:
+                full_name = param.name
+            if param._argument_name is not None:
+                argument_name = param._argument_name[0]
+            elif parent_argument_name is not None:
+                argument_name = parent_argument_name + '_' + param.name
+            else:
+                argument_name = param.name
+            self.nodes.append(ParameterWithPath(param, parent_node))
+            self.parents.append(parent)
+            self.children.append([])
+            self.full_names.append(full_name)
+            self.argument_names.append(argument_name)
+            if dispatch is not None:
+                self.adders.append(dispatch(param.type, 'add_parameter'))
+                self.converters.append(dispatch(param.type, 'parse_value'))
+                self.binders.append(dispatch(param.type, 'bind'))
+            else:
+                self.adders.append(())
+                self.converters.append(())
+                self.binders.append(())
+            stack.append((None, index))
+            for child in reversed(param.children):
+                stack.append((child, index))
+
+    @classmethod
+    def of(cls, root: Parameter,
+           dispatch: Optional[Callable[[Any, str], Tuple['Handler', ...]]] = None,
+           version: Any = None) -> 'ParameterPlan':
+        """Returns the plan of the tree, which is cached on the root.
+        The plans with handler chains are cached per dispatch function and rebuilt when
+        the version (of the registered handlers) changes. They share the arrays of the plan without
+        the handler chains, so that each tree is traversed only once."""
+        plans = root._plans
+        if plans is None:
+            plans = dict()
+            object.__setattr__(root, '_plans', plans)
+        plan_version, plan = plans.get(dispatch, (None, None))
+        if plan is None or plan_version != version:
+            if dispatch is None:
+                plan = cls(root)
+            else:
+                plan = copy.copy(cls.of(root))
+                plan.adders = [dispatch(x.type, 'add_parameter') for x in plan.nodes]
+                plan.converters = [dispatch(x.type, 'parse_value') for x in plan.nodes]
+                plan.binders = [dispatch(x.type, 'bind') for x in plan.nodes]
+            plans[dispatch] = (version, plan)
+        return plan
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def walk(self, fn: Callable[['ParameterWithPath', List[Any]], Any], reverse: bool = False):
+        """Equivalent of `Parameter.walk` implemented over the flat arrays."""
+        results: List[Any] = [None] * len(self.nodes)
+        # Reversed pre-order is the post-order with reversed children
+        order = reversed(range(len(self.nodes))) if reverse else self.postorder
+        for i in order:
+            children = []
+            for j in self.children[i]:
+                result = results[j]
+                if result is not None:
+                    if isinstance(result, ParameterWithPath):
+                        result = result.parameter
+                    children.append(result)
+            results[i] = fn(self.nodes[i], children=children)
+        result = results[0]
+        if isinstance(result, ParameterWithPath):
+            return result.parameter
+        return result
+
+
+def _overrides(handler: 'Handler', method: str) -> bool:
+    return getattr(type(handler), method, None) is not getattr(Handler, method)
 
 
 class Runtime:
@@ -220,6 +497,23 @@ class Runtime:
 
 
 class Handler:
+    # Types claimed by the handler, None means that the handler does not declare its types
+    types: Optional[Tuple[Any, ...]] = None
+    # Set to False if preprocess_parameter only depends on the parameter and its children (not on its path),
+    # which allows the subtrees shared by repeated classes to be preprocessed once
+    path_dependent: bool = True
+
+    def handles_type(self, tp: Any) -> Optional[bool]:
+        """
+        Returns True if the handler claims parameters of type tp, False if it never handles them,
+        and None if it cannot tell, in which case the handler is probed for all parameters.
+        The result is cached per type and it only limits the per-parameter methods
+        (preprocess_parameter, parse_value, bind, add_parameter).
+        """
+        if self.types is None:
+            return None
+        return tp in self.types
+
     def preprocess_parameter(self, parameter: ParameterWithPath) -> Tuple[bool, ParameterWithPath]:
         return False, parameter
 
@@ -233,6 +527,53 @@ class Handler:
         return False
 
 
+def import_object(path: str):
+    """Imports an object given by a "package.module:QualifiedName" path."""
+    import importlib
+
+    module_name, _, qualname = path.partition(':')
+    value = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        value = getattr(value, name)
+    return value
+
+
+class _LazyVariant:
+    """Variant of a conditional type declared as a "package.module:ClassName" string.
+    The class is imported when the variant is selected.
+    """
+    __slots__ = ('path', '_value')
+
+    def __init__(self, path: str):
+        self.path = path
+        self._value = None
+
+    def resolve(self):
+        if self._value is None:
+            self._value = import_object(self.path)
+        return self._value
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.path == other.path
+
+    def __hash__(self):
+        return hash((_LazyVariant, self.path))
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.path!r})'
+
+
+def resolve_variant(tp):
+    if isinstance(tp, _LazyVariant):
+        return tp.resolve()
+    return tp
+
+
 class _ConditionalTypeMeta(type):
     def __new__(cls, name, bases, ns, prefix=True, default=None):
         """Create new typed dict class object.
@@ -252,6 +593,9 @@ class _ConditionalTypeMeta(type):
             annotations.update(base.__dict__.get('__annotations__', {}))
 
         annotations.update(own_annotations)
+        for key, value in annotations.items():
+            if isinstance(value, str) and ':' in value:
+                annotations[key] = _LazyVariant(value)
         tp = Union.__getitem__(tuple(annotations.values()) + (None,))
         setattr(tp, '__conditional_map__', annotations)
         setattr(tp, '__conditional_prefix__', prefix)
@@ -279,6 +623,9 @@ def ConditionalType(typename, fields=None, *, prefix: bool = True, default=None,
         Model = ConditionalType('Model', dict(gpt2=GPT2, resnet=ResNet))
     The class syntax is only supported in Python 3.6+, while two other
     syntax forms work for Python 2.7 and 3.2+
+    The variants can also be given as "package.module:ClassName" strings,
+    in which case the class is only imported when the variant is selected::
+        Model = ConditionalType('Model', gpt2='models.gpt2:GPT2', resnet='models.resnet:ResNet')
     """
     if fields is None:
         fields = kwargs
@@ -0,0 +1,253 @@
+'''
+Manifest answering --help (and --version) of an entry point without importing the program.
+The manifest is a JSON file built once, storing the help texts for all selections of the conditional types,
+the options (with their help, defaults, and choices, in the format of the completion index), and the hashes
+of the source files the parameters were collected from, e.g.:
+
+    python -m aparse.manifest build train:train train.manifest.json --prog train.py --version 1.2
+
+The entry point then answers from the manifest before importing the program:
+
+    import sys
+    from aparse.manifest import answer_from_manifest
+    if answer_from_manifest('train.manifest.json'):
+        sys.exit(0)
+    from train import train
+
+The manifest is ignored (and answer_from_manifest returns False) whenever any of the source files changed,
+so the regular parser is used until the manifest is rebuilt.
+'''
+import sys
+import json
+from typing import Any, Dict, Iterable, List, Optional, Set, TextIO
+
+
+_MANIFEST_FORMAT = 1
+
+
+def _selection_key(selection: List[Optional[str]]) -> str:
+    return json.dumps(selection)
+
+
+def _get_environment():
+    from . import __version__
+
+    return dict(aparse=__version__, python='.'.join(map(str, sys.version_info[:2])))
+
+
+def _create_parser(obj: Any, prog: Optional[str], description: Optional[str], ignore: Optional[Set[str]]):
+    from argparse import ArgumentParser
+    from .argparse import _add_argparse_arguments
+    from .utils import get_parameters
+    from ._lib import preprocess_parameters
+
+    parser = ArgumentParser(prog=prog, description=description)
+    if hasattr(obj, 'add_argparse_arguments'):
+        return obj.add_argparse_arguments(parser)
+    return _add_argparse_arguments(preprocess_parameters(get_parameters(obj)), parser, ignore=ignore)
+
+
+def _render_argparse_help(obj: Any, prog: Optional[str], description: Optional[str], ignore: Optional[Set[str]],
+                          switches: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    import itertools
+    from .argparse import ArgparseRuntime
+
+    names = sorted(switches.keys())
+    values = [switches[x]['choices'] + ([] if switches[x]['default'] is not None else [None]) for x in names]
+    help_texts = dict()
+    for selection in itertools.product(*values):
+        # The parser is modified by the selected variants, a new one is created for each selection
+        parser = _create_parser(obj, prog, description, ignore)
+        soft_defaults, defaults, _, sweep = parser._aparse_runtime
+        runtime = ArgparseRuntime(parser, soft_defaults=soft_defaults, sweep=sweep)
+        kwargs = dict(defaults)
+        # The switches are stored by their option names (--name), the raw arguments by their argument names
+        kwargs.update((k[2:].replace('-', '_'), v) for k, v in zip(names, selection) if v is not None)
+        runtime.add_selected_parameters(kwargs)
+        help_texts[_selection_key([v or switches[k]['default'] for k, v in zip(names, selection)])] = parser.format_help()
+    return help_texts
+
+
+def _render_click_help(command, prog: Optional[str]) -> str:
+    import click
+
+    with click.Context(command, info_name=prog) as ctx:
+        return command.get_help(ctx) + '\n'
+
+
+def build_manifest(obj: Any, prog: Optional[str] = None, description: Optional[str] = None,
+                   version: Optional[str] = None, sources: Iterable[str] = (),
+                   ignore: Optional[Set[str]] = None) -> Dict[str, Any]:
+    '''
+    Builds the manifest of a function or class (decorated with add_argparse_arguments or not),
+    or of a command created by aparse.click.command. For argparse, the help is rendered for every
+    combination of the ConditionalType values. For click, the help of the command is stored as is,
+    because the click options are fixed when the command is created.
+
+    Arguments:
+        obj: Function, class, or click command
+        prog: Name of the program shown in the usage
+        description: Description of the program shown in the help (argparse only)
+        version: Version printed for --version
+        sources: Additional files invalidating the manifest when changed (e.g., modules registering handlers)
+        ignore: Set of parameters to ignore when inspecting the function signature (undecorated objects only)
+
+    Returns: Dictionary, which can be stored as JSON.
+    '''
+    import os
+    from .completion import build_completion_index
+    from .utils import get_parameters
+    from ._cache import collect_source_files, file_fingerprint, get_source_file
+
+    command = None
+    if hasattr(obj, 'callback') and hasattr(obj, 'params'):
+        command, obj = obj, obj.callback
+    parameters = get_parameters(obj)
+    for param in parameters.enumerate_parameters():
+        if hasattr(param.type, '__conditional_fmap__'):
+            raise ValueError(f'The help of {param.full_name} (FunctionConditionalType) cannot be precomputed')
+
+    index = build_completion_index(command or obj, prog=prog, ignore=ignore)
+    switches = dict()
+    for option, conditional in index['conditional'].items():
+        if conditional.get('parent') is not None:
+            # The conditional types nested in variants are not selected before parsing
+            continue
+        switches[option] = dict(default=conditional['default'], choices=list(conditional['variants'].keys()))
+
+    if command is not None:
+        help_texts = {_selection_key([None] * len(switches)): _render_click_help(command, prog)}
+        switches = dict()
+    else:
+        help_texts = _render_argparse_help(obj, prog, description, ignore, switches)
+
+    # The variant classes (which were imported by building the index) can come from other modules
+    files = set(collect_source_files(obj, parameters))
+    for param in parameters.enumerate_parameters():
+        for tp in (getattr(param.type, '__conditional_map__', None) or dict()).values():
+            from .core import resolve_variant
+
+            tp = resolve_variant(tp)
+            if tp is not None:
+                files.update(collect_source_files(tp, get_parameters(tp)))
+    files.update(os.path.abspath(x) for x in sources)
+    files.discard(get_source_file(build_manifest))
+    return dict(
+        format=_MANIFEST_FORMAT,
+        environment=_get_environment(),
+        prog=prog,
+        version=version,
+        sources={x: file_fingerprint(x) for x in sorted(files)},
+        switches=switches,
+        help=help_texts,
+        options=index['options'],
+        conditional=index['conditional'])
+
+
+def write_manifest(obj: Any, path: str, **kwargs):
+    '''
+    Builds the manifest (see build_manifest) and stores it as JSON.
+    '''
+    manifest = build_manifest(obj, **kwargs)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def load_manifest(path: str) -> Optional[Dict[str, Any]]:
+    '''
+    Returns the manifest if it is up to date, otherwise None.
+    '''
+    from ._cache import file_fingerprint
+
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != _MANIFEST_FORMAT or manifest.get('environment') != _get_environment():
+        return None
+    for source, fingerprint in manifest['sources'].items():
+        if file_fingerprint(source) != fingerprint:
+            return None
+    return manifest
+
+
+def _get_selection(manifest: Dict[str, Any], argv: List[str]) -> Optional[List[Optional[str]]]:
+    switches = manifest['switches']
+    names = sorted(switches.keys())
+    selection = [switches[x]['default'] for x in names]
+    for i, word in enumerate(argv):
+        option, has_value, value = word.partition('=')
+        if option not in switches:
+            continue
+        if not has_value:
+            if i + 1 >= len(argv):
+                return None
+            value = argv[i + 1]
+        if value not in switches[option]['choices']:
+            return None
+        selection[names.index(option)] = value
+    return selection
+
+
+def answer_from_manifest(path: str, argv: Optional[List[str]] = None, file: Optional[TextIO] = None) -> bool:
+    '''
+    Prints the help (for -h or --help) or the version (for --version) stored in the manifest.
+    Only the manifest and the source files are read, the program is not imported.
+
+    Arguments:
+        path: Path to the manifest
+        argv: Command line arguments without the program name, defaults to sys.argv[1:]
+        file: Output stream, defaults to sys.stdout
+
+    Returns: True if the arguments were answered, False if the regular parser has to be used
+        (e.g., if the arguments do not ask for the help, or the manifest is missing or out of date).
+    '''
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if '--' in argv:
+        argv = argv[:argv.index('--')]
+    wants_help = '-h' in argv or '--help' in argv
+    if not wants_help and '--version' not in argv:
+        return False
+    manifest = load_manifest(path)
+    if manifest is None:
+        return False
+    file = file if file is not None else sys.stdout
+    if not wants_help:
+        if manifest['version'] is None:
+            return False
+        file.write(f'{manifest["version"]}\n')
+        return True
+    selection = _get_selection(manifest, argv)
+    help_text = manifest['help'].get(_selection_key(selection)) if selection is not None else None
+    if help_text is None:
+        return False
+    file.write(help_text)
+    return True
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m aparse.manifest', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    build = commands.add_parser('build', help='build the manifest of "package.module:function"')
+    build.add_argument('object')
+    build.add_argument('manifest')
+    build.add_argument('--prog')
+    build.add_argument('--description')
+    build.add_argument('--version')
+    build.add_argument('--sources', nargs='+', default=[])
+    build.add_argument('--ignore', nargs='+')
+    args = parser.parse_args(argv)
+
+    from .core import import_object
+
+    write_manifest(import_object(args.object), args.manifest, prog=args.prog, description=args.description,
+                   version=args.version, sources=args.sources, ignore=set(args.ignore) if args.ignore else None)
+
+
+if __name__ == '__main__':
+    main()
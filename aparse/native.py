@@ -0,0 +1,328 @@
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from .core import Parameter, ParameterPlan, DefaultFactory, Runtime
+from ._lib import add_parameters as _add_parameters
+from ._lib import preprocess_parameters as _preprocess_parameters
+from ._lib import handle_before_parse as _handle_before_parse
+from ._lib import handle_after_parse as _handle_after_parse
+from ._binder import get_binder as _get_binder
+from .utils import _empty, merge_parameter_trees, ignore_parameters
+from .utils import get_parameters as _get_parameters
+from ._cache import cached_parameters as _cached_parameters
+from ._instrument import timed as _timed
+
+
+class _Option:
+    def __init__(self, dest, option_strings, argument_type, required, help, default, choices):
+        self.dest = dest
+        self.option_strings = option_strings
+        self.type = argument_type
+        self.required = required
+        self.help = help
+        self.default = default
+        self.choices = choices
+
+    @property
+    def is_flag(self):
+        return self.type == bool
+
+    @property
+    def display_name(self):
+        # The same name argparse uses in error messages
+        return '/'.join(self.option_strings)
+
+    @property
+    def metavar(self):
+        if self.choices is not None:
+            return '{' + ','.join(map(str, self.choices)) + '}'
+        return self.dest.upper()
+
+
+class NativeRuntime(Runtime):
+    '''
+    Runtime parsing the command line arguments directly against the parameter tree, without argparse.
+    The options are stored in a hash map indexed by the option strings and the arguments are
+    parsed, converted, validated and bound in a single pass over argv.
+    Supported syntax is "--x=y", "--x y", and "--x"/"--no-x" for bool arguments.
+    Errors are reported in the same format as argparse uses.
+    '''
+    def __init__(self, prog: Optional[str] = None, soft_defaults: bool = False,
+                 defaults: Optional[Dict[str, Any]] = None):
+        self.prog = prog or os.path.basename(sys.argv[0])
+        self.soft_defaults = soft_defaults
+        self.defaults = defaults or dict()
+        self.parameters: Optional[Parameter] = None
+        self._options: Dict[str, _Option] = dict()
+        self._option_index: Dict[str, Tuple[_Option, Optional[bool]]] = dict()
+        self._before_parse_callbacks: List[Callable] = []
+        self._after_parse_callbacks: List[Callable] = []
+
+    def copy(self) -> 'NativeRuntime':
+        runtime = NativeRuntime(self.prog, soft_defaults=self.soft_defaults, defaults=dict(self.defaults))
+        runtime.parameters = self.parameters
+        runtime._options = {k: _Option(v.dest, v.option_strings, v.type, v.required, v.help, v.default, v.choices)
+                            for k, v in self._options.items()}
+        runtime._option_index = {k: (runtime._options[o.dest], v) for k, (o, v) in self._option_index.items()}
+        runtime._before_parse_callbacks = self._before_parse_callbacks
+        runtime._after_parse_callbacks = self._after_parse_callbacks
+        return runtime
+
+    def add_parameter(self, argument_name, argument_type, required=True,
+                      help='', default=_empty, choices=None):
+        dest = argument_name.split('/', 1)[0]
+        default = default if default != _empty else None
+        existing_option = self._options.get(dest)
+        if existing_option is not None:
+            existing_option.required = required
+            existing_option.help = help
+            existing_option.choices = choices
+            existing_option.default = default
+            return
+
+        option_strings = ['--' + x.replace('_', '-') for x in argument_name.split('/')]
+        option = _Option(dest, option_strings, argument_type, required, help, default, choices)
+        self._options[dest] = option
+        if option.is_flag:
+            true_option, false_option = option_strings
+            self._option_index[true_option] = (option, True)
+            self._option_index[false_option] = (option, False)
+        else:
+            self._option_index[option_strings[0]] = (option, None)
+
+    def read_defaults(self, parameters: Parameter) -> Parameter:
+        def map(param, children):
+            if param.name is None or param.type is None or len(param.children) > 0:
+                return param.replace(children=children)
+
+            existing_option = self._options.get(param.argument_name)
+            if existing_option is None:
+                return param.replace(children=children)
+
+            default_factory = DefaultFactory.get_factory(existing_option.default)
+            if existing_option.required:
+                default_factory = None
+            return param.replace(choices=existing_option.choices, default_factory=default_factory,
+                                 argument_type=existing_option.type, children=children)
+        return parameters.walk(map)
+
+    def add_parameters(self, parameters: Parameter):
+        self.parameters = merge_parameter_trees(self.parameters, parameters)
+        # Only the defaults of the added parameters are applied (e.g., of a selected conditional type)
+        full_names = set(ParameterPlan.of(parameters).full_names)
+        defaults = {k: v for k, v in self.defaults.items() if k in full_names}
+        _add_parameters(parameters, runtime=self, soft_defaults=self.soft_defaults, defaults=defaults or None)
+
+    def format_usage(self) -> str:
+        parts = [f'usage: {self.prog} [-h]']
+        for option in self._options.values():
+            if option.is_flag:
+                parts.append(f'[{" | ".join(option.option_strings)}]')
+            elif option.required:
+                parts.append(f'{option.option_strings[0]} {option.metavar}')
+            else:
+                parts.append(f'[{option.option_strings[0]} {option.metavar}]')
+        return ' '.join(parts) + '\n'
+
+    def format_help(self) -> str:
+        rows = [('-h, --help', 'show this help message and exit')]
+        for option in self._options.values():
+            if option.is_flag:
+                name = ', '.join(option.option_strings)
+            else:
+                name = f'{option.option_strings[0]} {option.metavar}'
+            params = []
+            default = option.default
+            if isinstance(default, DefaultFactory):
+                default = default()
+            if default is not None:
+                params.append(f'default: {default}')
+            if option.required:
+                params.append('required')
+            help = option.help or ''
+            if params:
+                help = f'{help} [{", ".join(params)}]'.strip()
+            rows.append((name, help))
+        width = min(max(len(x) for x, _ in rows), 24) + 4
+        # The header argparse uses, which was renamed in Python 3.10
+        header = 'options:' if sys.version_info >= (3, 10) else 'optional arguments:'
+        lines = [self.format_usage().rstrip('\n'), '', header]
+        for name, help in rows:
+            if len(name) + 4 > width:
+                lines.append(f'  {name}')
+                if help:
+                    lines.append(' ' * width + help)
+            else:
+                lines.append(f'  {name.ljust(width - 2)}{help}'.rstrip())
+        return '\n'.join(lines) + '\n'
+
+    def error(self, message: str):
+        sys.stderr.write(self.format_usage())
+        sys.stderr.write(f'{self.prog}: error: {message}\n')
+        raise SystemExit(2)
+
+    def _scan_arguments(self, args: List[str]) -> Dict[str, Any]:
+        # Raw string values passed to the before_parse callbacks
+        kwargs = dict(**self.defaults)
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            i += 1
+            if not arg.startswith('--'):
+                continue
+            name, has_value, value = arg.partition('=')
+            entry = self._option_index.get(name)
+            if not has_value:
+                if entry is not None and entry[1] is not None:
+                    value = entry[1]
+                elif i < len(args) and not args[i].startswith('--'):
+                    value = args[i]
+                    i += 1
+                else:
+                    value = True
+            # Negated flags (--no-x) set the destination of the flag (x=False)
+            kwargs[entry[0].dest if entry is not None else name[2:].replace('-', '_')] = value
+        return kwargs
+
+    @_timed('parse_args')
+    def _consume(self, args: List[str]) -> Dict[str, Any]:
+        values: Dict[str, Any] = dict()
+        unrecognized: List[str] = []
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            i += 1
+            if arg in ('-h', '--help'):
+                sys.stdout.write(self.format_help())
+                raise SystemExit(0)
+            if arg == '--':
+                unrecognized.extend(args[i:])
+                break
+            name, has_value, value = arg.partition('=')
+            entry = self._option_index.get(name) if arg.startswith('--') else None
+            if entry is None:
+                unrecognized.append(arg)
+                continue
+            option, flag_value = entry
+            if flag_value is not None:
+                if has_value:
+                    self.error(f'argument {option.display_name}: ignored explicit argument {value!r}')
+                values[option.dest] = flag_value
+                continue
+            if not has_value:
+                if i >= len(args) or (args[i].startswith('-') and not _is_negative_number(args[i])):
+                    self.error(f'argument {option.display_name}: expected one argument')
+                value = args[i]
+                i += 1
+            values[option.dest] = self._convert(option, value)
+
+        missing = [x.display_name for x in self._options.values() if x.required and x.dest not in values]
+        if missing:
+            self.error(f'the following arguments are required: {", ".join(missing)}')
+        if unrecognized:
+            self.error(f'unrecognized arguments: {" ".join(unrecognized)}')
+        for option in self._options.values():
+            if option.dest not in values:
+                default = option.default
+                if isinstance(default, str) and option.type is not None and option.type != str:
+                    default = self._convert(option, default)
+                values[option.dest] = default
+        return values
+
+    def _convert(self, option: _Option, value: str):
+        if option.type is not None and option.type != str:
+            try:
+                value = option.type(value)
+            except (TypeError, ValueError):
+                name = getattr(option.type, '__name__', repr(option.type))
+                self.error(f'argument {option.display_name}: invalid {name} value: {value!r}')
+        if option.choices is not None and value not in option.choices:
+            choices = ', '.join(map(repr, option.choices))
+            self.error(f'argument {option.display_name}: invalid choice: {value!r} (choose from {choices})')
+        return value
+
+    def parse_args(self, args: Optional[List[str]] = None) -> Tuple[Parameter, Dict[str, Any]]:
+        '''
+        Parses the arguments and returns the parameters (including parameters added
+        by the before_parse callbacks) and the parsed values indexed by argument names.
+        '''
+        args = list(sys.argv[1:] if args is None else args)
+        runtime = self
+        new_parameters = _handle_before_parse(self, self.parameters, self._scan_arguments(args),
+                                              self._before_parse_callbacks)
+        if new_parameters is not None:
+            # The runtime itself is kept intact, so that it can be reused for other arguments
+            runtime = self.copy()
+            runtime.add_parameters(new_parameters)
+        return runtime.parameters, runtime._consume(args)
+
+    def bind(self, args: Optional[List[str]] = None) -> Dict[str, Any]:
+        parameters, values = self.parse_args(args)
+        kwargs, _ = _get_binder(parameters)(values)
+        return _handle_after_parse(parameters, values, kwargs, self._after_parse_callbacks)
+
+
+def _is_negative_number(value: str) -> bool:
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+
+class Command:
+    '''
+    Function or class extended with a native argument parser.
+    Calling the command parses the arguments (sys.argv by default) and calls the original function.
+    '''
+    def __init__(self, fn, runtime: NativeRuntime):
+        self.fn = fn
+        self.runtime = runtime
+        self.__wrapped__ = fn
+        self.__doc__ = getattr(fn, '__doc__', None)
+        self.__name__ = getattr(fn, '__name__', None)
+
+    def parse_args(self, args: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self.runtime.bind(args)
+
+    def __call__(self, args: Optional[List[str]] = None, **kwargs):
+        new_kwargs = self.parse_args(args)
+        new_kwargs.update(kwargs)
+        return self.fn(**new_kwargs)
+
+
+def command(
+        _fn=None, *, prog: Optional[str] = None,
+        ignore: Optional[Set[str]] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+        soft_defaults: bool = False,
+        before_parse: Optional[Callable[[Parameter, Runtime, Dict[str, Any]], Optional[Parameter]]] = None,
+        after_parse: Optional[Callable[[Parameter, Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = None):
+    '''
+    Turns a function or class into a command parsing its arguments with the NativeRuntime.
+
+    Arguments:
+        prog: Name of the program shown in the usage, defaults to sys.argv[0]
+        ignore: Set of parameters to ignore when inspecting the function signature
+        defaults: Overrides of the default values
+        soft_defaults: Allow merging parameters with conflicting defaults
+        before_parse: Callback to be called before the arguments are parsed
+        after_parse: Callback to be called after the arguments are bound
+
+    Returns: Command object, which can be called to parse the arguments and call the function.
+    '''
+    def wrap(fn):
+        parameters = _cached_parameters(fn, lambda: _preprocess_parameters(_get_parameters(fn)))
+        if ignore is not None:
+            parameters = ignore_parameters(parameters, ignore)
+        runtime = NativeRuntime(prog, soft_defaults=soft_defaults, defaults=defaults)
+        if before_parse is not None:
+            runtime._before_parse_callbacks.append(before_parse)
+        if after_parse is not None:
+            runtime._after_parse_callbacks.append(after_parse)
+        runtime.add_parameters(parameters)
+        return Command(fn, runtime)
+
+    if _fn is not None:
+        return wrap(_fn)
+    return wrap
@@ -1,9 +1,9 @@
 import inspect
-from typing import Any
-from functools import reduce
+import weakref
+from typing import Any, Tuple
 import dataclasses
-import copy
-from .core import Parameter, _empty, ParameterWithPath, DefaultFactory
+from .core import Parameter, _empty, ParameterPlan, DefaultFactory
+from ._instrument import timed
 
 
 def unwrap_type(tp):
@@ -42,91 +42,93 @@ def get_path(obj, path, default=_empty, _current_path=None):
 
 
 def prefix_parameter(parameter, prefix, container_type=None):
-    parameter = copy.copy(parameter)
-    has_container = True
-    if parameter.name is not None:
-        root = Parameter(name=None, type=dict, children=[parameter], is_container=True)
-        parameter = root
-        has_container = False
-
-    def prefix_single(x, name):
-        parent = Parameter(name=name, type=container_type, is_container=True)
-        parent.children = x.children
-        x.children = [parent]
-        return x
-
-    parts = reversed([x for x in prefix.split('.') if x != ''])
-    parameter = reduce(prefix_single, parts, parameter)
+    has_container = parameter.name is None
+    children = parameter.children if has_container else (parameter,)
+    for name in reversed([x for x in prefix.split('.') if x != '']):
+        children = (Parameter(name=name, type=container_type, children=children, is_container=True),)
     if not has_container:
-        parameter = parameter.children[0]
-    return parameter
+        return children[0]
+    return parameter.replace(children=children)
 
 
 def merge_parameter_trees(*args):
     # Fix single parameters
     def _fix_single_parameter(x):
         if x.name is not None:
-            root = Parameter(name=None, type=dict)
-            root.children = [x]
-            return root
+            return Parameter(name=None, type=dict, children=(x,))
         return x
 
     parameters = list(map(_fix_single_parameter, (x for x in args if x is not None)))
+    if len(parameters) == 1:
+        # Keeping the identity allows reusing the binders compiled for the tree
+        return parameters[0]
     return parameters[0].replace(children=[y for x in parameters for y in x.children])
 
 
-def get_parameters(obj: Any) -> Parameter:
-    generated = set()
-    root = Parameter(name=None, type=dict)
+# Children of the parameters annotated with a class, shared by all occurrences of the class.
+# The names of the children do not depend on their path, the prefixes are
+# computed from the path when the tree is traversed.
+_class_children: 'weakref.WeakKeyDictionary[type, Tuple[Parameter, ...]]' = weakref.WeakKeyDictionary()
 
-    def collect_parameters(cls, parent, parent_name=None):
-        parameters = inspect.signature(cls.__init__).parameters
-        calls_parent = False
-        for p in parameters.values():
-            if p.name == 'self':
+
+def _collect_parameters(cls, generated):
+    parameters = inspect.signature(cls.__init__).parameters
+    calls_parent = False
+    for p in parameters.values():
+        if p.name == 'self':
+            continue
+        if p.kind == inspect.Parameter.VAR_KEYWORD:
+            for base in cls.__bases__:
+                calls_parent = True
+        if p.kind == inspect.Parameter.KEYWORD_ONLY or p.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD:
+            if p.name in generated:
                 continue
-            if p.kind == inspect.Parameter.VAR_KEYWORD:
-                for base in cls.__bases__:
-                    calls_parent = True
-            if p.kind == inspect.Parameter.KEYWORD_ONLY or p.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD:
-                full_name = f'{parent_name}.{p.name}' if parent_name is not None else p.name
-                if full_name in generated:
-                    continue
-                # assert full_name not in generated, f'{full_name} was already generated'
-                if dataclasses.is_dataclass(cls) and isinstance(p.default, dataclasses._HAS_DEFAULT_FACTORY_CLASS):
-                    default_factory = DefaultFactory(cls.__dataclass_fields__[p.name].default_factory)
-                else:
-                    default_factory = DefaultFactory.get_factory(p.default)
-
-                param = Parameter(p.name, p.annotation, default_factory=default_factory)
-                generated.add(full_name)
-                if dataclasses.is_dataclass(unwrap_type(p.annotation)):
-                    param.children.extend(collect_parameters(unwrap_type(p.annotation), param, full_name))
-                yield param
-        if calls_parent:
-            for p in collect_parameters(base, parent, parent_name):
-                yield p
+            if dataclasses.is_dataclass(cls) and isinstance(p.default, dataclasses._HAS_DEFAULT_FACTORY_CLASS):
+                default_factory = DefaultFactory(cls.__dataclass_fields__[p.name].default_factory)
+            else:
+                default_factory = DefaultFactory.get_factory(p.default)
+
+            generated.add(p.name)
+            children = ()
+            if dataclasses.is_dataclass(unwrap_type(p.annotation)):
+                children = _get_class_children(unwrap_type(p.annotation))
+            yield Parameter(p.name, p.annotation, children=children, default_factory=default_factory)
+    if calls_parent:
+        for p in _collect_parameters(base, generated):
+            yield p
+
+
+def _get_class_children(cls) -> Tuple[Parameter, ...]:
+    children = _class_children.get(cls)
+    if children is None:
+        children = _class_children[cls] = tuple(_collect_parameters(cls, set()))
+    return children
 
+
+@timed('get_parameters')
+def get_parameters(obj: Any) -> Parameter:
+    root = Parameter(name=None, type=dict)
     if inspect.isclass(obj):
-        params = list(collect_parameters(obj, root, None))
+        params = _get_class_children(obj)
     else:
         params = []
         parameters = inspect.signature(obj).parameters
         for p in parameters.values():
             if p.kind == inspect.Parameter.KEYWORD_ONLY or p.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD:
                 default_factory = DefaultFactory.get_factory(p.default)
-                param = Parameter(
-                    p.name,
-                    p.annotation,
-                    default_factory=default_factory,
-                )
+                children = ()
                 tp = unwrap_type(p.annotation)
                 if dataclasses.is_dataclass(tp):
                     # Hierarchical arguments
-                    param.children.extend(collect_parameters(tp, param, param.name))
+                    children = _get_class_children(tp)
                 elif inspect.isclass(tp):
-                    param.children.extend(collect_parameters(tp, param, param.name))
-                params.append(param)
+                    children = _get_class_children(tp)
+                params.append(Parameter(
+                    p.name,
+                    p.annotation,
+                    children=children,
+                    default_factory=default_factory,
+                ))
     root = root.replace(children=params)
     return root
 
@@ -160,26 +162,29 @@ def get_parameters(obj: Any) -> Parameter:
 #     return False
 
 
+@timed('consolidate_parameter_tree')
 def consolidate_parameter_tree(parameters: Parameter, soft_defaults: bool = False) -> Parameter:
     par_map = dict()
+    plan = ParameterPlan.of(parameters)
 
-    for p in parameters.enumerate_parameters():
-        for c in p.children:
-            c_with_path = ParameterWithPath(c, p)
+    for i in range(len(plan)):
+        for j in plan.children[i]:
+            c_with_path = plan.nodes[j]
+            argument_name = plan.argument_names[j]
             default_factory = c_with_path.default_factory
             tp = c_with_path.type
             choices = c_with_path.choices
-            if c_with_path.argument_name in par_map:
-                o_default_factory, o_tp, o_choices = par_map[c_with_path.argument_name]
+            if argument_name in par_map:
+                o_default_factory, o_tp, o_choices = par_map[argument_name]
 
                 # Merge
                 compared_types = {str, int, float, bool}
                 if tp != o_tp and tp in compared_types and o_tp in compared_types:
-                    raise Exception(f'Could not merge parameter {c_with_path.argument_name} with different types: {tp}, {o_tp}')
+                    raise Exception(f'Could not merge parameter {argument_name} with different types: {tp}, {o_tp}')
 
                 if default_factory is not None and o_default_factory is not None and o_default_factory != default_factory:
                     if not soft_defaults:
-                        raise Exception(f'There are conflicting values for {c_with_path.argument_name}, [{default_factory}, {o_default_factory}]')
+                        raise Exception(f'There are conflicting values for {argument_name}, [{default_factory}, {o_default_factory}]')
 
                 if default_factory is None and o_default_factory is not None:
                     # Copy default value
@@ -192,19 +197,20 @@ def consolidate_parameter_tree(parameters: Parameter, soft_defaults: bool = Fals
                     else:
                         choices = sorted(set(o_choices).intersection(set(choices)))
 
-            par_map[c_with_path.argument_name] = (
+            par_map[argument_name] = (
                 default_factory,
                 tp,
                 choices
             )
 
-    def _walk(param, children):
-        if param.argument_name in par_map:
-            default_factory, _, choices = par_map[param.argument_name]
+    results = [None] * len(plan)
+    for i in plan.postorder:
+        param = plan.nodes[i].parameter
+        if plan.argument_names[i] in par_map:
+            default_factory, _, choices = par_map[plan.argument_names[i]]
             param = param.replace(default_factory=default_factory, choices=choices)
-
-        return param.replace(children=children)
-    return parameters.walk(_walk)
+        results[i] = param.replace(children=[results[j] for j in plan.children[i]])
+    return results[0]
 
 
 def ignore_parameters(parameters, ignore):
@@ -0,0 +1,46 @@
+'''
+Measures how the construction time of an argparse parser grows with the number of parameters.
+Run as "python benchmarks/bench_argparse_runtime.py". The time per parameter should stay
+roughly constant from 100 to 10,000 parameters.
+'''
+import time
+import inspect
+from argparse import ArgumentParser
+from aparse import add_argparse_arguments
+
+
+def make_function(size):
+    def fn(**kwargs):
+        return kwargs
+
+    fn.__signature__ = inspect.Signature([
+        inspect.Parameter(f'p{i}', inspect.Parameter.KEYWORD_ONLY, default=i, annotation=int)
+        for i in range(size)])
+    return add_argparse_arguments(fn)
+
+
+def measure(size, repeat=3):
+    fn = make_function(size)
+    best = float('inf')
+    for _ in range(repeat):
+        parser = ArgumentParser()
+        # Some actions added by hand before aparse runs
+        for i in range(0, size, 10):
+            parser.add_argument(f'--p{i}', type=int, default=i)
+        start = time.perf_counter()
+        fn.add_argparse_arguments(parser)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sizes = [100, 1000, 10000]
+    results = [(size, measure(size)) for size in sizes]
+    for size, elapsed in results:
+        print(f'{size:>6} parameters: {elapsed * 1000:9.2f} ms, {elapsed / size * 1e6:7.2f} us/parameter')
+    growth = (results[-1][1] / results[-1][0]) / (results[0][1] / results[0][0])
+    print(f'time per parameter grew {growth:.2f}x from {sizes[0]} to {sizes[-1]} parameters')
+
+
+if __name__ == '__main__':
+    main()
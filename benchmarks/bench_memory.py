@@ -0,0 +1,58 @@
+'''
+Measures the memory retained by the parameter trees of many parsers.
+Run as "PYTHONPATH=. python benchmarks/bench_memory.py". The script builds a parser
+for each of several large synthetic models (see schemas.py), keeps the parsers alive, and
+reports the retained memory (as traced by tracemalloc) per model and per parameter.
+'''
+import sys
+import json
+import tracemalloc
+import argparse
+from argparse import ArgumentParser
+from schemas import SCHEMAS
+from aparse import add_argparse_arguments
+from aparse.core import ParameterPlan
+
+
+def measure(schema: str, size: int, models: int) -> dict:
+    factory, _ = SCHEMAS[schema]
+    functions = [factory(size)[0] for _ in range(models)]
+    # The first model fills the caches of inspect, typing, etc.
+    add_argparse_arguments(factory(size)[0]).add_argparse_arguments(ArgumentParser())
+    parsers = []
+    tracemalloc.start()
+    try:
+        snapshot = tracemalloc.take_snapshot()
+        for fn in functions:
+            fn = add_argparse_arguments(fn)
+            parsers.append(fn.add_argparse_arguments(ArgumentParser()))
+        stats = tracemalloc.take_snapshot().compare_to(snapshot, 'filename')
+    finally:
+        tracemalloc.stop()
+    total_bytes = sum(x.size_diff for x in stats)
+    nodes = len(ParameterPlan(parsers[0]._aparse_parameters))
+    return dict(schema=schema, size=size, models=models, nodes_per_model=nodes,
+                bytes_per_model=total_bytes / models,
+                bytes_per_node=total_bytes / models / nodes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', type=int, default=48)
+    parser.add_argument('--output', help='output JSON file, defaults to the standard output')
+    args = parser.parse_args(argv)
+    results = [measure('flat', 1000, args.models), measure('nested', 32, args.models),
+               measure('inheritance', 32, args.models)]
+    for x in results:
+        print(f'{x["schema"]} ({x["size"]}): {x["bytes_per_model"] / 1024:.1f} KiB per model, '
+              f'{x["bytes_per_node"]:.0f} B per parameter', file=sys.stderr)
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
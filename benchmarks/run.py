@@ -0,0 +1,97 @@
+'''
+Benchmark suite for the schema construction, parsing, and binding.
+For each synthetic signature (see schemas.py) and size, the following phases are timed:
+get_parameters, add_argparse_arguments, parse_args, bind_argparse_arguments, and click_command.
+The results are written as JSON, e.g.:
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --schemas flat nested --sizes 10 100 --repeat 10
+'''
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+from argparse import ArgumentParser
+from schemas import SCHEMAS
+import aparse
+from aparse import add_argparse_arguments
+from aparse.utils import get_parameters
+
+
+def _time(fn, repeat: int, setup=None) -> dict:
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        fn(state)
+        times.append(time.perf_counter() - start)
+    return dict(min=min(times), median=statistics.median(times), repeat=repeat)
+
+
+def _time_click_command(factory, size: int, repeat: int) -> dict:
+    try:
+        import aparse.click
+    except ImportError:
+        return None
+
+    argv = sys.argv
+    # The click command reads sys.argv when it is created
+    sys.argv = [argv[0]]
+    try:
+        return _time(lambda fn: aparse.click.command()(fn), repeat, setup=lambda: factory(size)[0])
+    finally:
+        sys.argv = argv
+
+
+def benchmark(schema: str, size: int, repeat: int) -> dict:
+    factory, _ = SCHEMAS[schema]
+    _, args = factory(size)
+    fn = add_argparse_arguments(factory(size)[0])
+    parser = fn.add_argparse_arguments(ArgumentParser())
+    namespace = parser.parse_args(args)
+    phases = dict(
+        # A new schema is created for each repeat, otherwise the parameters are read from the cache
+        get_parameters=_time(lambda obj: get_parameters(obj), repeat, setup=lambda: factory(size)[0]),
+        add_argparse_arguments=_time(lambda _: fn.add_argparse_arguments(ArgumentParser()), repeat),
+        # Parsers are created in the setup, because conditional types modify the parser when parsing
+        parse_args=_time(lambda p: p.parse_args(args), repeat, setup=lambda: fn.add_argparse_arguments(ArgumentParser())),
+        bind_argparse_arguments=_time(lambda _: fn.bind_argparse_arguments(namespace), repeat),
+        click_command=_time_click_command(factory, size, repeat),
+    )
+    return dict(schema=schema, size=size, phases={k: v for k, v in phases.items() if v is not None})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--schemas', nargs='+', choices=list(SCHEMAS.keys()), default=list(SCHEMAS.keys()))
+    parser.add_argument('--sizes', nargs='+', type=int, help='sizes used for all schemas instead of their defaults')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='output JSON file, defaults to the standard output')
+    args = parser.parse_args(argv)
+
+    results = []
+    for schema in args.schemas:
+        for size in args.sizes or SCHEMAS[schema][1]:
+            results.append(benchmark(schema, size, args.repeat))
+            print(f'{schema} ({size}): ' + ', '.join(
+                f'{k} {v["median"] * 1000:.2f} ms' for k, v in results[-1]['phases'].items()), file=sys.stderr)
+
+    report = dict(
+        python=platform.python_version(),
+        platform=platform.platform(),
+        aparse=aparse.__version__,
+        timer_resolution=time.get_clock_info('perf_counter').resolution,
+        results=results,
+    )
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
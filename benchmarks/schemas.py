@@ -0,0 +1,108 @@
+'''
+Synthetic signatures used by the benchmarks.
+Every factory returns a fresh (undecorated) function or class and the command line arguments
+used to parse it, so that the decorators can be applied repeatedly.
+'''
+import inspect
+import dataclasses
+from typing import Callable, Dict, List, Tuple
+from aparse import ConditionalType, Literal
+
+
+def _leaf_fields(prefix: str, count: int):
+    types = [(int, 1), (float, 0.5), (str, 'value'), (bool, False), (Literal['a', 'b', 'c'], 'a')]
+    return [(f'{prefix}{i}', *types[i % len(types)]) for i in range(count)]
+
+
+def flat(size: int) -> Tuple[Callable, List[str]]:
+    '''
+    Function with "size" keyword arguments of mixed types.
+    '''
+    def fn(**kwargs):
+        return kwargs
+
+    fields = _leaf_fields('p', size)
+    fn.__signature__ = inspect.Signature([
+        inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=default, annotation=tp)
+        for name, tp, default in fields])
+    args = [f'--p{i}=2' for i, (_, tp, _) in enumerate(fields) if tp is int]
+    return fn, args
+
+
+def nested(size: int) -> Tuple[Callable, List[str]]:
+    '''
+    Dataclass nested "size" levels deep, with four arguments on each level.
+    '''
+    cls = None
+    for level in reversed(range(size)):
+        fields = [(name, tp, dataclasses.field(default=default)) for name, tp, default in _leaf_fields(f'f{level}_', 4)]
+        if cls is not None:
+            fields.append(('child', cls, dataclasses.field(default_factory=cls)))
+        cls = dataclasses.make_dataclass(f'Nested{level}', fields)
+    argument_name = 'config_' + 'child_' * (size - 1)
+    return _wrap_class(cls), [f'--{argument_name}f{size - 1}-0'.replace('_', '-'), '2']
+
+
+def _wrap_class(cls):
+    def fn(config: cls):
+        return config
+    return fn
+
+
+def wide_conditional(size: int) -> Tuple[Callable, List[str]]:
+    '''
+    Function with a ConditionalType argument switching between "size" dataclasses.
+    '''
+    variants = {}
+    for i in range(size):
+        fields = [(name, tp, dataclasses.field(default=default)) for name, tp, default in _leaf_fields(f'v{i}_', 4)]
+        variants[f'variant{i}'] = dataclasses.make_dataclass(f'Variant{i}', fields)
+    switch = ConditionalType('Switch', variants)
+
+    def fn(model: switch, seed: int = 0):
+        return model
+    return fn, ['--model', f'variant{size - 1}', f'--model-v{size - 1}-0', '2']
+
+
+def shared(size: int) -> Tuple[Callable, List[str]]:
+    '''
+    Function with "size" arguments of the same component dataclass, which nests an optimizer dataclass.
+    '''
+    optimizer = dataclasses.make_dataclass('Optimizer', [
+        (name, tp, dataclasses.field(default=default)) for name, tp, default in _leaf_fields('o', 4)])
+    component = dataclasses.make_dataclass('Component', [
+        (name, tp, dataclasses.field(default=default)) for name, tp, default in _leaf_fields('c', 4)
+    ] + [('optimizer', optimizer, dataclasses.field(default_factory=optimizer))])
+
+    def fn(**kwargs):
+        return kwargs
+
+    fn.__signature__ = inspect.Signature([
+        inspect.Parameter(f'component{i}', inspect.Parameter.KEYWORD_ONLY, annotation=component)
+        for i in range(size)])
+    return fn, [f'--component{size - 1}-optimizer-o0', '2']
+
+
+def inheritance(size: int) -> Tuple[Callable, List[str]]:
+    '''
+    Chain of "size" classes, each adding one argument and forwarding **kwargs to its parent.
+    '''
+    namespace: Dict[str, type] = dict()
+    lines = ['class Base0:', '    def __init__(self, p0: int = 0):', '        self.p0 = p0']
+    for i in range(1, size):
+        lines += [
+            f'class Base{i}(Base{i - 1}):',
+            f'    def __init__(self, p{i}: int = {i}, **kwargs):',
+            '        super().__init__(**kwargs)',
+        ]
+    exec('\n'.join(lines), namespace)
+    return namespace[f'Base{size - 1}'], ['--p0', '2']
+
+
+SCHEMAS = {
+    'flat': (flat, [10, 100, 1000]),
+    'nested': (nested, [2, 8, 32]),
+    'wide_conditional': (wide_conditional, [2, 16, 128]),
+    'shared': (shared, [2, 16, 128]),
+    'inheritance': (inheritance, [2, 8, 32]),
+}
@@ -4,6 +4,7 @@ from typing import List, Union
 from aparse import add_argparse_arguments, AllArguments, Parameter, DefaultFactory, Literal
 from aparse import ConditionalType, WithArgumentName, FunctionConditionalType
 from argparse import ArgumentParser
+import dataclasses
 from dataclasses import dataclass
 
 
@@ -661,6 +662,111 @@ def test_argparse_conditional_matching():
     assert k.prop_d2 == 'ok'
 
 
+def test_argparse_conditional_variants_are_cached(monkeypatch):
+    import aparse._handlers
+
+    @dataclass
+    class D1:
+        x: int = 1
+
+    @dataclass
+    class D2:
+        prop_d2: str = 'test-d2'
+
+    class DSwitch(ConditionalType):
+        d1: D1
+        d2: D2
+
+    calls = []
+    get_parameters = aparse._handlers.get_parameters
+    monkeypatch.setattr(aparse._handlers, 'get_parameters', lambda x: calls.append(x) or get_parameters(x))
+
+    @add_argparse_arguments(precompile=True)
+    def testfn(k: DSwitch):
+        return k
+
+    assert calls == [D1, D2]
+    for _ in range(3):
+        argparser = testfn.add_argparse_arguments(ArgumentParser())
+        k = testfn.from_argparse_arguments(argparser.parse_args(['--k', 'd1', '--k-x', '3']))
+        assert isinstance(k, D1)
+        assert k.x == 3
+        argparser = testfn.add_argparse_arguments(ArgumentParser())
+        k = testfn.from_argparse_arguments(argparser.parse_args(['--k', 'd2', '--k-prop-d2', 'ok']))
+        assert k.prop_d2 == 'ok'
+    assert calls == [D1, D2]
+
+
+def test_argparse_conditional_variant_cache_is_bounded(monkeypatch):
+    import aparse._handlers
+
+    monkeypatch.setattr(aparse._handlers, '_variant_cache_size', 4)
+
+    def make_variant(kwargs):
+        # A new type is generated for every parse
+        return dataclasses.make_dataclass('D', [('x', int, 1)])
+
+    @add_argparse_arguments
+    def testfn(k: FunctionConditionalType(make_variant)):
+        return k
+
+    for i in range(10):
+        argparser = testfn.add_argparse_arguments(ArgumentParser())
+        k = testfn.from_argparse_arguments(argparser.parse_args(['--k-x', str(i)]))
+        assert k.x == i
+        assert len(aparse._handlers._variant_cache) <= 4
+
+
+def test_argparse_generated_types_are_released(monkeypatch):
+    import gc
+    import weakref
+    import aparse._handlers
+
+    monkeypatch.setattr(aparse._handlers, '_variant_cache_size', 4)
+    generated = []
+
+    def make_variant(kwargs):
+        tp = dataclasses.make_dataclass('D', [('x', int, 1)])
+        generated.append(weakref.ref(tp))
+        return tp
+
+    @add_argparse_arguments
+    def testfn(k: FunctionConditionalType(make_variant)):
+        return k
+
+    for i in range(20):
+        argparser = testfn.add_argparse_arguments(ArgumentParser())
+        assert testfn.from_argparse_arguments(argparser.parse_args(['--k-x', str(i)])).x == i
+    gc.collect()
+    # Only the types held by the variant cache are alive
+    assert sum(x() is not None for x in generated) <= 4
+
+
+def test_argparse_conditional_lazy_variants(tmp_path, monkeypatch):
+    (tmp_path / 'aparse_lazy_variants.py').write_text(
+        'from dataclasses import dataclass\n\n\n'
+        '@dataclass\nclass D1:\n    prop: str = "test"\n\n\n'
+        '@dataclass\nclass D2:\n    prop: str = "test-d2"\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'aparse_lazy_variants', raising=False)
+
+    DSwitch = ConditionalType('DSwitch', d1='aparse_lazy_variants:D1', d2='aparse_lazy_variants:D2')
+
+    @add_argparse_arguments
+    def testfn(k: DSwitch = 'd1'):
+        return k
+
+    argparser = testfn.add_argparse_arguments(ArgumentParser())
+    assert '--k {d1,d2}' in argparser.format_help()
+    assert 'aparse_lazy_variants' not in sys.modules
+
+    args = argparser.parse_args(['--k', 'd2', '--k-prop', 'ok'])
+    k = testfn.from_argparse_arguments(args)
+    assert type(k).__name__ == 'D2'
+    assert k.prop == 'ok'
+    assert k == sys.modules['aparse_lazy_variants'].D2('ok')
+
+
 def test_argparse_function_conditional_matching():
     @dataclass
     class D1:
@@ -724,3 +830,367 @@ def test_argparse_conditional_matching_no_prefix():
     k = testfn.from_argparse_arguments(args)
     assert isinstance(k, D2)
     assert k.prop_d2 == 'ok'
+
+
+def test_argparse_action_index_tracks_manual_actions():
+    @add_argparse_arguments()
+    def testfn1(k: int = 1):
+        return k
+
+    @add_argparse_arguments()
+    def testfn2(k: int = 1, m: int = 3):
+        return k, m
+
+    argparser = ArgumentParser()
+    testfn1.add_argparse_arguments(argparser)
+    argparser.add_argument('--m', type=int, default=3)
+    testfn2.add_argparse_arguments(argparser)
+
+    assert len([x for x in argparser._actions if x.dest == 'm']) == 1
+    args = argparser.parse_args(['--m', '5'])
+    assert testfn2.from_argparse_arguments(args) == (1, 5)
+
+
+def test_handler_dispatch_by_declared_types():
+    from aparse import Handler, register_handler
+    from aparse import _lib
+
+    class Point:
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+
+    calls = []
+
+    @register_handler
+    class PointHandler(Handler):
+        types = (Point,)
+
+        def preprocess_parameter(self, parameter):
+            calls.append(parameter.name)
+            return True, parameter.replace(argument_type=str, children=[])
+
+        def parse_value(self, parameter, value):
+            return True, Point(*map(int, value.split(',')))
+
+    try:
+        @add_argparse_arguments()
+        def testfn(p: Point, k: int = 1):
+            return p, k
+
+        argparser = ArgumentParser()
+        argparser = testfn.add_argparse_arguments(argparser)
+        assert calls == ['p']
+        assert _lib.get_handlers(int, 'preprocess_parameter')[0] is not _lib.handlers[0]
+        assert _lib.get_handlers(Point, 'preprocess_parameter')[0] is _lib.handlers[0]
+
+        args = argparser.parse_args(['--p', '1,2'])
+        p, k = testfn.from_argparse_arguments(args)
+        assert (p.x, p.y, k) == (1, 2, 1)
+    finally:
+        _lib.handlers.pop(0)
+        _lib._handler_chains.clear()
+
+
+def test_argparse_parameters_are_built_lazily(monkeypatch):
+    import aparse.argparse
+
+    calls = []
+    get_parameters = aparse.argparse._get_parameters
+    monkeypatch.setattr(aparse.argparse, '_get_parameters', lambda x: calls.append(x) or get_parameters(x))
+
+    @add_argparse_arguments(ignore={'m'})
+    def testfn(k: int = 1, m: float = 2.):
+        return k, m
+
+    assert calls == []
+    argparser = testfn.add_argparse_arguments(ArgumentParser())
+    args = argparser.parse_args(['--k', '3'])
+    assert not hasattr(args, 'm')
+    assert testfn.from_argparse_arguments(args) == (3, 2.)
+    assert testfn.bind_argparse_arguments(args) == dict(k=3)
+    assert calls == [testfn]
+
+
+def test_argparse_binder_is_cached():
+    from aparse._binder import get_binder
+
+    @dataclass
+    class D:
+        a: int = 1
+        b: List[int] = None
+
+    @add_argparse_arguments()
+    def testfn(d: D, k: int = 1, all: AllArguments = None):
+        return d, k
+
+    argparser = ArgumentParser()
+    argparser = testfn.add_argparse_arguments(argparser)
+    args = argparser.parse_args(['--d-b', '1,2'])
+    args2 = argparser.parse_args(['--k', '3'])
+    assert args._aparse_parameters is args2._aparse_parameters
+
+    binder = get_binder(args._aparse_parameters)
+    assert get_binder(args2._aparse_parameters) is binder
+    assert 'def bind(arguments):' in binder.source
+    kwargs, unknown = binder(dict(d_a=1, d_b='1,2', k=1, x=5))
+    assert kwargs['d'] == D(1, [1, 2])
+    assert kwargs['all'] == dict(d_a=1, d_b='1,2', k=1, x=5)
+    assert unknown == dict(x=5)
+
+    assert testfn.from_argparse_arguments(args) == (D(1, [1, 2]), 1)
+    assert testfn.from_argparse_arguments(args2, k=4) == (D(1, None), 4)
+    assert testfn.from_argparse_arguments(args2) == (D(1, None), 3)
+
+
+def test_binder_compiles_on_reuse_and_is_released():
+    import gc
+    import weakref
+    from aparse._binder import get_binder
+    from aparse._lib import preprocess_parameters
+    from aparse.utils import get_parameters
+
+    @dataclass
+    class D:
+        a: int = 1
+        b: List[int] = None
+
+    def testfn(d: D, k: int = 1):
+        pass
+
+    parameters = preprocess_parameters(get_parameters(testfn))
+    binder = get_binder(parameters)
+    arguments = dict(d_a=2, d_b='1,2', k=3)
+    assert binder(arguments) == (dict(d=D(2, [1, 2]), k=3), dict())
+    assert binder._bind is None
+    assert binder(arguments) == (dict(d=D(2, [1, 2]), k=3), dict())
+    assert binder._bind is not None
+
+    ref = weakref.ref(parameters)
+    del parameters, binder
+    gc.collect()
+    assert ref() is None
+
+
+def test_argparse_lazy_binding():
+    import copy
+    from aparse._binder import Binder
+
+    loaded = []
+
+    class Pattern:
+        def __init__(self, value):
+            self.value = value
+
+        @staticmethod
+        def from_str(value):
+            loaded.append(value)
+            return Pattern(value)
+
+    @dataclass
+    class Data:
+        pattern: Pattern = None
+        size: int = 1
+
+    @dataclass
+    class Model:
+        pattern: Pattern = None
+        data: Data = None
+
+    @add_argparse_arguments
+    def testfn(model: Model, data: Data, k: int = 1):
+        return model, data, k
+
+    argparser = testfn.add_argparse_arguments(ArgumentParser())
+    args = argparser.parse_args(['--model-pattern', 'a', '--model-data-pattern', 'b', '--data-pattern', 'c', '--k', '2'])
+    kwargs = testfn.bind_argparse_arguments(args, lazy=True)
+    assert kwargs['k'] == 2
+    assert loaded == []
+
+    assert kwargs['data'].size == 1
+    assert loaded == ['c']
+    assert isinstance(kwargs['model'], Model)
+    assert loaded == ['c', 'a']
+    assert kwargs['model'].data.pattern.value == 'b'
+    assert loaded == ['c', 'a', 'b']
+    assert kwargs['model'] == Model(kwargs['model'].pattern, Data(kwargs['model'].data.pattern, 1))
+    assert type(copy.deepcopy(kwargs['data'])) is Data
+
+    model, data, k = testfn.from_argparse_arguments(args, _lazy=True)
+    assert loaded == ['c', 'a', 'b']
+    assert data.pattern.value == 'c'
+
+    # The dataclass helpers accept the proxies, both when the binder is interpreted and when it is compiled
+    binder = Binder(args._aparse_parameters, lazy=True)
+    for compiled in [False, True]:
+        kwargs, _ = binder(vars(args))
+        assert (binder._bind is not None) == compiled
+        assert dataclasses.is_dataclass(kwargs['model'])
+        assert [x.name for x in dataclasses.fields(kwargs['model'])] == ['pattern', 'data']
+        assert dataclasses.asdict(kwargs['data'])['size'] == 1
+        assert dataclasses.astuple(kwargs['model'])[1][1] == 1
+        assert dataclasses.replace(kwargs['model'].data, size=3) == Data(kwargs['model'].data.pattern, 3)
+    assert (model.pattern.value, k) == ('a', 2)
+
+
+def test_argparse_nested_dataclasses_are_constructed_once():
+    from dataclasses import field
+
+    constructed = []
+
+    @dataclass
+    class Vocab:
+        size: int = 10
+
+        def __post_init__(self):
+            constructed.append('vocab')
+
+    @dataclass
+    class Model:
+        vocab: Vocab = field(default_factory=Vocab)
+        dim: int = 4
+
+        def __post_init__(self):
+            constructed.append('model')
+
+    @dataclass
+    class Config:
+        model: Model = field(default_factory=lambda: Model())
+
+    @add_argparse_arguments
+    def testfn(config: Config, other: Model = Model()):
+        return config.model, other
+
+    args = testfn.add_argparse_arguments(ArgumentParser()).parse_args(['--config-model-vocab-size', '3'])
+    # The first call interprets the plan, the second call (checked below) compiles and runs the binder
+    testfn.from_argparse_arguments(args)
+    del constructed[:]
+    model, other = testfn.from_argparse_arguments(args)
+    assert constructed == ['vocab', 'model', 'vocab', 'model']
+    assert model == Model(Vocab(3), 4) and other == Model(Vocab(10), 4)
+
+
+def test_argparse_nested_dataclass_subclass_default():
+    @dataclass
+    class Base:
+        a: int = 1
+
+    @dataclass
+    class Sub(Base):
+        b: int = 7
+
+    @add_argparse_arguments
+    def testfn(cfg: Base = Sub()):
+        return cfg
+
+    args = testfn.add_argparse_arguments(ArgumentParser()).parse_args(['--cfg-a', '3'])
+    # Both the interpreted (first call) and the generated binder keep the class of the default
+    for _ in range(2):
+        assert testfn.from_argparse_arguments(args) == Sub(3, 7)
+
+
+def test_sweep_argparse_arguments():
+    @dataclass
+    class D1:
+        prop: int = 1
+
+    @dataclass
+    class D2:
+        prop2: str = 'test'
+
+    class DSwitch(ConditionalType):
+        d1: D1
+        d2: D2
+
+    @add_argparse_arguments
+    def testfn(k: DSwitch, lr: float = 1., layers: List[int] = None, flag: bool = False):
+        return k, lr, layers
+
+    argparser = ArgumentParser()
+    argparser = testfn.add_argparse_arguments(argparser, sweep=True)
+    args = argparser.parse_args(['--k', 'd1,d2', '--lr', '0.1,0.2', '--k-prop', '3,4', '--k-prop2', 'a',
+                                 '--layers', '1,2', '--flag'])
+    configs = testfn.sweep_argparse_arguments(args)
+    assert not isinstance(configs, list)
+    assert list(configs) == [
+        dict(k=D1(3), lr=0.1, layers=[1, 2], flag=True),
+        dict(k=D1(4), lr=0.1, layers=[1, 2], flag=True),
+        dict(k=D1(3), lr=0.2, layers=[1, 2], flag=True),
+        dict(k=D1(4), lr=0.2, layers=[1, 2], flag=True),
+        dict(k=D2('a'), lr=0.1, layers=[1, 2], flag=True),
+        dict(k=D2('a'), lr=0.2, layers=[1, 2], flag=True),
+    ]
+    shards = [list(testfn.sweep_argparse_arguments(args, num_shards=4, shard_index=i)) for i in range(4)]
+    assert list(map(len, shards)) == [2, 2, 1, 1]
+    assert shards[1][1] == dict(k=D2('a'), lr=0.2, layers=[1, 2], flag=True)
+
+    with pytest.raises(SystemExit):
+        argparser.parse_args(['--k', 'd1,d3'])
+
+
+def test_sweep_argparse_arguments_does_not_split_defaults():
+    @add_argparse_arguments
+    def testfn(k: int = 1, lr: float = 1., name: str = 'x,y'):
+        return k, lr, name
+
+    argparser = testfn.add_argparse_arguments(ArgumentParser(), sweep=True)
+    args = argparser.parse_args(['--k', '1,2', '--lr', '0.1,0.2'])
+    assert args.name == 'x,y'
+    configs = list(testfn.sweep_argparse_arguments(args))
+    assert len(configs) == 4
+    assert all(x['name'] == 'x,y' for x in configs)
+    assert testfn.from_argparse_arguments(argparser.parse_args([])) == (1, 1., 'x,y')
+
+    args = argparser.parse_args(['--name', 'a,b'])
+    assert [x['name'] for x in testfn.sweep_argparse_arguments(args)] == ['a', 'b']
+
+
+@add_argparse_arguments
+def _parallel_testfn(k: int = 1, m: float = 2., name: str = 'a'):
+    return k * m, name
+
+
+def test_map_from_argparse_arguments():
+    from concurrent.futures import ThreadPoolExecutor
+
+    argparser = ArgumentParser()
+    argparser = _parallel_testfn.add_argparse_arguments(argparser)
+    configs = [argparser.parse_args(['--k', str(i)]) for i in range(5)] + [dict(k=10, m=1.)]
+    expected = [(i * 2., 'b') for i in range(5)] + [(10., 'b')]
+    assert _parallel_testfn.map_from_argparse_arguments(configs, name='b', max_workers=2) == expected
+    with ThreadPoolExecutor(2) as executor:
+        results = _parallel_testfn.map_from_argparse_arguments(configs, name='b', executor=executor, as_completed=True)
+        assert sorted(results) == list(enumerate(expected))
+
+
+def test_instrument():
+    from aparse import _lib, instrument
+
+    def callback(param, runtime, kwargs):
+        return None
+
+    @add_argparse_arguments(before_parse=callback)
+    def testfn(k: int = 1, m: List[int] = None):
+        return k, m
+
+    handlers = list(_lib.handlers)
+    events = []
+    with instrument(lambda name, elapsed: events.append(name)) as stats:
+        # The instrumented handlers keep sharing the preprocessed subtrees
+        assert not any(h.path_dependent for h in _lib.handlers)
+        argparser = ArgumentParser()
+        argparser = testfn.add_argparse_arguments(argparser)
+        args = argparser.parse_args(['--k', '3', '--m', '1,2'])
+        assert testfn.from_argparse_arguments(args) == (3, [1, 2])
+
+    assert _lib.handlers == handlers
+    for name in ['add_parameters', 'consolidate_parameter_tree', 'handle_before_parse', 'parse_args',
+                 'bind_parameters', 'DefaultHandler.add_parameter', 'SimpleListHandler.parse_value',
+                 'before_parse:test_instrument.<locals>.callback']:
+        assert stats[name].calls >= 1, name
+        assert stats[name].total >= 0
+    assert stats['parse_args'].calls == 1
+    assert set(events) == set(stats.keys())
+
+    # Disabled instrumentation does not collect anything
+    argparser.parse_args(['--k', '3'])
+    assert stats['parse_args'].calls == 1
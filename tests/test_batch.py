@@ -0,0 +1,125 @@
+import pytest
+from typing import List
+from dataclasses import dataclass
+from aparse import add_argparse_arguments, ConditionalType, Literal
+
+
+@dataclass
+class D1:
+    prop: int = 1
+
+
+@dataclass
+class D2:
+    prop2: str = 'test'
+
+
+class DSwitch(ConditionalType):
+    d1: D1
+    d2: D2
+
+
+def test_bind_many_dict_of_lists():
+    @add_argparse_arguments
+    def testfn(k: int, m: float = 2., flag: bool = False, mode: Literal['a', 'b'] = 'a'):
+        return dict(k=k, m=m, flag=flag, mode=mode)
+
+    rows = testfn.bind_many(dict(k=[1, 2, 3], m=['0.5', None, 3], flag=['true', '0', ''], mode=['b', 'a', None]))
+    assert rows == [
+        dict(k=1, m=0.5, flag=True, mode='b'),
+        dict(k=2, m=2., flag=False, mode='a'),
+        dict(k=3, m=3., flag=False, mode='a'),
+    ]
+    assert testfn.from_rows(dict(k=[1, 2]), m=5.) == [
+        dict(k=1, m=5., flag=False, mode='a'),
+        dict(k=2, m=5., flag=False, mode='a'),
+    ]
+
+
+def test_bind_many_csv(tmp_path):
+    @dataclass
+    class Config:
+        lr: float
+        steps: List[int]
+        d1: D1
+
+    @add_argparse_arguments
+    def testfn(config: Config, name: str = 'x'):
+        return config, name
+
+    path = tmp_path / 'sweep.csv'
+    path.write_text('config-lr,config_steps,config.d1.prop,name\n0.1,"1,2",3,\n0.2,"1,2",,y\n')
+    rows = testfn.from_rows(str(path))
+    assert rows == [
+        (Config(0.1, [1, 2], D1(3)), 'x'),
+        (Config(0.2, [1, 2], D1(1)), 'y'),
+    ]
+    assert rows[0][0].steps is not rows[1][0].steps
+
+
+def test_bind_many_conditional_types():
+    @add_argparse_arguments
+    def testfn(k: DSwitch, n: int = 0):
+        return k, n
+
+    rows = testfn.from_rows(dict(k=['d1', 'd2', 'd1'], k_prop=['5', None, '7'], k_prop2=[None, 'ok', None]))
+    assert rows == [(D1(5), 0), (D2('ok'), 0), (D1(7), 0)]
+
+
+def test_bind_many_validation():
+    @add_argparse_arguments
+    def testfn(k: int, mode: Literal['a', 'b'] = 'a'):
+        pass
+
+    with pytest.raises(ValueError, match="invalid int value: 'x'"):
+        testfn.bind_many(dict(k=['1', 'x']))
+    with pytest.raises(ValueError, match="invalid choice: 'c'"):
+        testfn.bind_many(dict(k=[1, 2], mode=['a', 'c']))
+    with pytest.raises(ValueError, match="Row 1: missing required value 'k'"):
+        testfn.bind_many(dict(k=[1, None]))
+    with pytest.raises(ValueError, match="Missing required column 'k'"):
+        testfn.bind_many(dict(mode=['a']))
+    with pytest.raises(ValueError, match='Unknown columns: j'):
+        testfn.bind_many(dict(k=[1], j=[1]))
+
+
+def test_bind_many_structured_array():
+    np = pytest.importorskip('numpy')
+
+    @add_argparse_arguments
+    def testfn(k: int, m: float = 2.):
+        return k, m
+
+    data = np.array([(1, 0.5), (2, 1.5)], dtype=[('k', 'i8'), ('m', 'f8')])
+    assert testfn.from_rows(data) == [(1, 0.5), (2, 1.5)]
+
+
+def test_bind_many_converts_values_once():
+    from aparse import Handler, register_handler, _lib
+
+    class Doubled(int):
+        pass
+
+    @register_handler
+    class DoubledHandler(Handler):
+        types = (Doubled,)
+
+        def preprocess_parameter(self, parameter):
+            return True, parameter.replace(argument_type=int)
+
+        def parse_value(self, parameter, value):
+            return True, Doubled(2 * value)
+
+    try:
+        @add_argparse_arguments
+        def testfn(x: Doubled = Doubled(0)):
+            return x
+
+        import argparse
+        parser = testfn.add_argparse_arguments(argparse.ArgumentParser())
+        assert testfn.from_argparse_arguments(parser.parse_args(['--x', '1'])) == 2
+        assert testfn.from_rows(dict(x=[1, 2, 3])) == [2, 4, 6]
+        assert testfn.from_rows(dict(x=[1, 2, 3])) == [2, 4, 6]
+    finally:
+        _lib.handlers.pop(0)
+        _lib._handler_chains.clear()
@@ -0,0 +1,116 @@
+import sys
+import importlib
+from argparse import ArgumentParser
+import pytest
+
+
+MODULE_SOURCE = '''
+from dataclasses import dataclass
+from aparse import add_argparse_arguments
+
+
+@dataclass
+class Config:
+    lr: float = 0.1
+    name: str = 'test'
+
+
+@add_argparse_arguments()
+def train(config: Config, steps: int = {steps}):
+    return config, steps
+'''
+
+
+@pytest.fixture
+def cached_module(tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    monkeypatch.setenv('APARSE_CACHE', str(cache_dir))
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    def _import(steps=3):
+        (tmp_path / 'aparse_cached_module.py').write_text(MODULE_SOURCE.format(steps=steps))
+        sys.modules.pop('aparse_cached_module', None)
+        importlib.invalidate_caches()
+        return importlib.import_module('aparse_cached_module')
+
+    yield cache_dir, _import
+    sys.modules.pop('aparse_cached_module', None)
+
+
+def test_cache_stores_parameters(cached_module):
+    cache_dir, _import = cached_module
+    module = _import()
+    # The parameters are built and stored on the first use
+    assert not cache_dir.exists()
+
+    parser = module.train.add_argparse_arguments(ArgumentParser())
+    assert len(list(cache_dir.iterdir())) == 1
+    config, steps = module.train.from_argparse_arguments(parser.parse_args(['--config-lr', '0.5']))
+    assert config.lr == 0.5
+    assert steps == 3
+
+
+def test_cache_is_used(cached_module, monkeypatch):
+    import aparse.utils
+
+    _, _import = cached_module
+    _import().train.add_argparse_arguments(ArgumentParser())
+
+    def _fail(*args, **kwargs):
+        raise AssertionError('get_parameters should not be called')
+
+    monkeypatch.setattr(aparse.utils, 'get_parameters', _fail)
+    monkeypatch.setattr('aparse.argparse._get_parameters', _fail)
+    module = _import()
+    parser = module.train.add_argparse_arguments(ArgumentParser())
+    _, steps = module.train.from_argparse_arguments(parser.parse_args([]))
+    assert steps == 3
+
+
+def test_cache_invalidated_on_source_change(cached_module):
+    _, _import = cached_module
+    _import(steps=3)
+    module = _import(steps=7)
+    parser = module.train.add_argparse_arguments(ArgumentParser())
+    _, steps = module.train.from_argparse_arguments(parser.parse_args([]))
+    assert steps == 7
+
+
+def test_cache_disabled(cached_module, monkeypatch, tmp_path):
+    cache_dir, _import = cached_module
+    monkeypatch.setenv('APARSE_CACHE', '0')
+    _import()
+    assert not cache_dir.exists()
+
+
+HANDLER_SOURCE = '''
+from aparse import Handler
+
+
+class NoopHandler(Handler):
+    def preprocess_parameter(self, parameter):
+        return False, parameter
+'''
+
+
+def test_cache_invalidated_on_handler_change(cached_module, tmp_path):
+    from aparse import _cache, _lib
+
+    (tmp_path / 'aparse_cache_handler.py').write_text(HANDLER_SOURCE)
+    importlib.invalidate_caches()
+    handler_module = importlib.import_module('aparse_cache_handler')
+    _lib.register_handler(handler_module.NoopHandler)
+    try:
+        cache_dir, _import = cached_module
+        _import().train.add_argparse_arguments(ArgumentParser())
+        path = str(next(cache_dir.iterdir()))
+        assert _cache._load(path) is not None
+
+        # The body of the handler changes, but its name does not
+        with open(tmp_path / 'aparse_cache_handler.py', 'a') as f:
+            f.write('\n# changed\n')
+        assert _cache._load(path) is None
+    finally:
+        _lib.handlers.pop(0)
+        _lib._handler_chains.clear()
+        sys.modules.pop('aparse_cache_handler', None)
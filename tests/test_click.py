@@ -712,3 +712,19 @@ def test_special_case_4(monkeypatch):
 
     testfn()
     assert was_called
+
+
+def test_click_options_attached_once(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['prg.py', '--k', '2'])
+
+    @click.command()
+    @_click.option('--k', type=int, default=1)
+    @_click.option('--x', type=int, default=1)
+    def test(k: int, a: int = 3, b: str = 'b', use_c: bool = False):
+        pass
+
+    names = [x.name for x in test.params]
+    assert sorted(names) == ['a', 'b', 'k', 'use_c', 'x']
+    assert len(names) == len(set(names))
+    assert [x for x in test.params if x.name == 'k'][0].default == 1
+    assert [x for x in test.params if x.name == 'use_c'][0].secondary_opts == ['--no-c']
@@ -0,0 +1,122 @@
+import sys
+import json
+import subprocess
+from dataclasses import dataclass
+from aparse import ConditionalType, Literal
+from aparse.completion import build_completion_index, complete, main
+
+
+@dataclass
+class A:
+    lr: float = 0.1
+    mode: Literal['x', 'y'] = 'x'
+
+
+@dataclass
+class B:
+    depth: int = 1
+    use_bias: bool = True
+
+
+class Model(ConditionalType, default='a'):
+    a: A
+    b: B
+
+
+def train(model: Model, k: int = 1, verbose: bool = False, kind: Literal[1, 2] = 1):
+    pass
+
+
+def test_completion_index():
+    index = build_completion_index(train, prog='train.py')
+    assert json.loads(json.dumps(index)) == index
+    assert complete(index, ['']) == [
+        '--help', '--k', '--kind', '--model', '--model-lr', '--model-mode', '--no-verbose', '--verbose']
+    assert complete(index, ['--mod']) == ['--model', '--model-lr', '--model-mode']
+    assert complete(index, ['--model', '']) == ['a', 'b']
+    assert complete(index, ['--model', 'b', '--model-']) == ['--model-depth', '--model-use-bias']
+    assert complete(index, ['--model=b', '--no-m']) == ['--no-model-use-bias']
+    assert complete(index, ['--model-mode', '']) == ['x', 'y']
+    assert complete(index, ['--kind=']) == ['--kind=1', '--kind=2']
+    assert complete(index, ['--kind', '=', '2']) == ['2']
+    assert complete(index, ['--k', '']) == []
+    assert complete(index, ['--verbose', '--h']) == ['--help']
+
+
+def test_completion_click_command(monkeypatch):
+    import aparse.click
+
+    monkeypatch.setattr(sys, 'argv', ['train.py'])
+    command = aparse.click.command()(train)
+    index = build_completion_index(command)
+    assert complete(index, ['--model', 'b', '--model-d']) == ['--model-depth']
+
+
+def test_completion_index_decorator_ignore(monkeypatch):
+    import aparse.click
+    from aparse import add_argparse_arguments
+
+    def fn(model: Model, k: int = 1, verbose: bool = False):
+        pass
+
+    decorated = add_argparse_arguments(ignore={'k'})(fn)
+    assert complete(build_completion_index(decorated), ['--']) == [
+        '--help', '--model', '--model-lr', '--model-mode', '--no-verbose', '--verbose']
+    assert complete(build_completion_index(decorated, ignore={'verbose'}), ['--']) == [
+        '--help', '--model', '--model-lr', '--model-mode']
+
+    monkeypatch.setattr(sys, 'argv', ['train.py'])
+    command = aparse.click.command(ignore={'k', 'model'})(train)
+    assert complete(build_completion_index(command), ['--']) == [
+        '--help', '--kind', '--no-verbose', '--verbose']
+
+
+def test_completion_shim(tmp_path, capsys):
+    index_path = str(tmp_path / 'index.json')
+    main(['build', 'tests.test_completion:train', index_path, '--prog', 'train.py'])
+    main(['bash', index_path])
+    script = capsys.readouterr().out
+    assert 'complete -o default -F _aparse_complete_train_py train.py' in script
+
+    # The completion does not import the program nor the backends
+    code = (
+        'import sys\n'
+        'from aparse.completion import main\n'
+        f'main(["complete", {index_path!r}, "--", "--model", ""])\n'
+        'assert not any(x.startswith("aparse.") and x != "aparse.completion" for x in sys.modules)\n'
+        'assert "tests.test_completion" not in sys.modules\n')
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.decode().split() == ['a', 'b']
+
+
+@dataclass
+class C:
+    width: int = 1
+
+
+class Inner(ConditionalType, default='c'):
+    c: C
+    a: A
+
+
+@dataclass
+class N:
+    inner: Inner = None
+
+
+class Outer(ConditionalType, default='b'):
+    b: B
+    n: N
+
+
+def train_nested(outer: Outer):
+    pass
+
+
+def test_completion_index_nested_conditional_types():
+    index = build_completion_index(train_nested)
+    assert index['conditional']['--outer-inner']['parent'] == ['--outer', 'n']
+    assert complete(index, ['--outer-']) == ['--outer-depth', '--outer-use-bias']
+    assert complete(index, ['--outer', 'n', '--outer-inner', '']) == ['a', 'c']
+    assert complete(index, ['--outer', 'n', '--outer-inn']) == ['--outer-inner', '--outer-inner-width']
+    assert complete(index, ['--outer', 'n', '--outer-inner', 'a', '--outer-inner-m']) == ['--outer-inner-mode']
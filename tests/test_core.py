@@ -76,3 +76,227 @@ def test_forward_parameters_class_args():
     param = get_parameters(B)
     assert param.find('a') is None
     assert param.find('b').default == 3
+
+
+def test_parameter_plan():
+    from aparse.core import ParameterPlan
+
+    @dataclass
+    class D3:
+        d1: D1
+        c: int = 1
+
+    def fn(x: D3, y: str = 'a'):
+        pass
+
+    plan = ParameterPlan(get_parameters(fn))
+    assert plan.full_names == [None, 'x', 'x.d1', 'x.d1.a', 'x.c', 'y']
+    assert plan.argument_names == [None, 'x', 'x_d1', 'x_d1_a', 'x_c', 'y']
+    assert plan.parents == [-1, 0, 1, 2, 1, 0]
+    assert plan.children[1] == [2, 4]
+    assert plan.postorder == [3, 2, 4, 1, 5, 0]
+    for node, full_name, argument_name in zip(plan.nodes, plan.full_names, plan.argument_names):
+        assert node.full_name == full_name
+        assert node.argument_name == argument_name
+
+
+def test_parameter_plan_is_cached_on_the_root():
+    from aparse import _lib
+    from aparse.core import ParameterPlan
+
+    def fn(x: int, y: str = 'a'):
+        pass
+
+    params = get_parameters(fn)
+    plan = ParameterPlan.of(params)
+    assert ParameterPlan.of(params) is plan
+    compiled = _lib.compile_plan(params)
+    assert _lib.compile_plan(params) is compiled
+    assert compiled.nodes is plan.nodes
+    assert compiled.adders != plan.adders
+
+    # The handler chains are resolved again when the handlers change
+    _lib._handlers_version += 1
+    assert _lib.compile_plan(params) is not compiled
+    assert ParameterPlan.of(params) is plan
+
+
+def test_parameter_plan_walk():
+    from aparse.core import ParameterPlan
+
+    @dataclass
+    class D3:
+        d1: D1
+        c: int = 1
+
+    def fn(x: D3, y: str = 'a'):
+        pass
+
+    def _rename(param, children):
+        if param.name is None:
+            return param.replace(children=children)
+        return param.replace(name=param.name + '_', children=children)
+
+    params = get_parameters(fn)
+    expected = params.walk(_rename)
+    assert ParameterPlan(params).walk(_rename) == expected
+    assert ParameterPlan(params).walk(_rename, reverse=True) == params.walk(_rename, reverse=True)
+
+
+def test_parameter_names_are_memoised():
+    from aparse.core import Parameter, ParameterWithPath
+
+    node = Parameter('leaf', int, _argument_name=('custom',))
+    for i in reversed(range(100)):
+        node = Parameter(f'p{i}', dict, children=[node])
+    root = Parameter(None, dict, children=[node])
+
+    path = ParameterWithPath(root)
+    for i in range(100):
+        path = path.find(f'p{i}')
+    assert path.full_name == '.'.join(f'p{i}' for i in range(100))
+    assert path.argument_name == '_'.join(f'p{i}' for i in range(100))
+    assert path.find('leaf').argument_name == 'custom'
+    assert path.find('leaf') is path.find('leaf')
+    assert path.find('missing') is None
+
+
+def test_parameter_is_immutable():
+    import pickle
+    import pytest
+    from aparse.core import Parameter
+
+    root = Parameter(None, dict, children=[Parameter('a', int), Parameter('b', int), Parameter('a', str)])
+    assert isinstance(root.children, tuple)
+    assert root.find('a').type == int
+    assert root.find('c') is None
+    with pytest.raises(AttributeError):
+        root.name = 'x'
+    with pytest.raises(AttributeError):
+        root.extra = 1
+    new_root = root.replace(children=root.children[1:])
+    assert new_root.find('a').type == str
+    assert root.find('a').type == int
+    assert pickle.loads(pickle.dumps(root)) == root
+    assert new_root != root
+
+
+def test_get_parameters_shares_class_subtrees():
+    from aparse.core import ParameterPlan
+
+    @dataclass
+    class Optimizer:
+        lr: float = 0.1
+        momentum: float = 0.9
+
+    @dataclass
+    class Component:
+        optimizer: Optimizer = None
+
+    def fn(a: Component, b: Component, c: Optimizer):
+        pass
+
+    param = get_parameters(fn)
+    a_optimizer = param.find('a').find('optimizer')
+    assert param.find('a').children is param.find('b').children
+    assert a_optimizer.children is param.find('c').children
+    assert get_parameters(fn).find('c').children is param.find('c').children
+
+    plan = ParameterPlan(param)
+    assert [x for x in plan.argument_names if x is not None] == [
+        'a', 'a_optimizer', 'a_optimizer_lr', 'a_optimizer_momentum',
+        'b', 'b_optimizer', 'b_optimizer_lr', 'b_optimizer_momentum',
+        'c', 'c_lr', 'c_momentum']
+
+
+def test_preprocess_parameters_shares_class_subtrees():
+    from aparse import _lib
+    from aparse.core import Handler
+
+    @dataclass
+    class Optimizer:
+        lr: float = 0.1
+
+    @dataclass
+    class Component:
+        optimizer: Optimizer = None
+
+    def fn(a: Component, b: Component, c: Optimizer):
+        pass
+
+    param = _lib.preprocess_parameters(get_parameters(fn))
+    assert all(x is y for x, y in zip(param.find('a').children, param.find('b').children))
+    assert param.find('a').find('optimizer').children[0] is param.find('c').children[0]
+    assert param.find('c').find('lr').argument_type == float
+
+    # Handlers which can depend on the path disable the sharing
+    class PathHandler(Handler):
+        def preprocess_parameter(self, parameter):
+            return False, parameter
+
+    _lib.register_handler(PathHandler)
+    try:
+        param = _lib.preprocess_parameters(get_parameters(fn))
+        assert param.find('a').children[0] is not param.find('b').children[0]
+    finally:
+        _lib.handlers.pop(0)
+        _lib._handler_chains.clear()
+
+
+def test_parameter_walk_is_copy_on_write():
+    import sys
+    from aparse.core import Parameter
+    from aparse.utils import ignore_parameters
+
+    root = Parameter(None, dict, children=[
+        Parameter('a', dict, children=[Parameter('x', int), Parameter('y', int)]),
+        Parameter('b', dict, children=[Parameter('x', int)])])
+    assert root.walk(lambda x, children: x.replace(children=children)) is root
+    assert root.replace(name=None, children=list(root.children)) is root
+
+    new_root = ignore_parameters(root, {'a.y'})
+    assert new_root is not root
+    assert new_root.find('b') is root.find('b')
+    assert new_root.find('a').find('x') is root.find('a').find('x')
+    assert new_root.find('a').find('y') is None
+
+    # The walk is not limited by the recursion limit
+    depth = sys.getrecursionlimit() + 100
+    node = Parameter('leaf', int)
+    for i in range(depth):
+        node = Parameter(f'p{i}', dict, children=[node])
+    deep = Parameter(None, dict, children=[node])
+    names = []
+    assert deep.walk(lambda x, children: names.append(x.argument_name) or x.replace(children=children)) is deep
+    assert names[0].endswith('_leaf') and names[0].count('_') == depth
+    assert sum(1 for _ in deep.enumerate_parameters()) == depth + 2
+
+
+def test_default_factory_is_materialised_once():
+    import pickle
+    from aparse.core import DefaultFactory
+
+    calls = []
+
+    def factory():
+        calls.append(None)
+        return dict(a=[1, 2], b='x')
+
+    default = DefaultFactory(factory)
+    assert str(default) == repr(default) == "{'a': [1, 2], 'b': 'x'}"
+    assert default == DefaultFactory(lambda: dict(b='x', a=[2, 1]))
+    assert hash(default) == hash(default)
+    assert default.get_default() is default
+    assert len(calls) == 1
+
+    # Calls return new values, which can be modified
+    value = default()
+    value['a'].append(3)
+    assert default() == dict(a=[1, 2], b='x')
+    assert len(calls) == 3
+
+    constant = DefaultFactory(lambda: calls.append(None) or 5)
+    assert constant() == constant.get_default() == 5
+    assert constant == DefaultFactory.get_factory(5)
+    assert len(calls) == 4
+    assert pickle.loads(pickle.dumps(DefaultFactory.get_factory([1]))) == DefaultFactory.get_factory([1])
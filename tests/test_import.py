@@ -0,0 +1,58 @@
+import sys
+import subprocess
+
+
+def _imported_modules(code):
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            stderr=subprocess.PIPE, check=True, universal_newlines=True).stderr
+    modules = []
+    for line in output.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            modules.append(line.rsplit('|', 1)[-1].strip())
+    return modules
+
+
+def test_import_aparse_is_lazy():
+    modules = _imported_modules('import aparse')
+    assert 'aparse' in modules
+    assert [x for x in modules if x.startswith('aparse.')] == []
+    assert 'argparse' not in modules
+    assert 'dataclasses' not in modules
+
+
+def test_import_core_names_does_not_import_backends():
+    modules = _imported_modules('from aparse import Parameter, ConditionalType')
+    assert 'aparse.core' in modules
+    assert 'aparse.argparse' not in modules
+    assert 'argparse' not in modules
+
+
+def test_lazy_register_handler_keeps_order():
+    code = '''
+import aparse
+
+@aparse.register_handler
+class CustomHandler(aparse.Handler):
+    pass
+
+from aparse._lib import handlers
+from aparse._handlers import DefaultHandler
+assert isinstance(handlers[0], CustomHandler), handlers
+assert isinstance(handlers[-1], DefaultHandler), handlers
+assert aparse.add_argparse_arguments is not None
+'''
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_lazy_attributes():
+    import aparse
+    from aparse.core import Parameter
+
+    assert aparse.Parameter is Parameter
+    assert 'add_argparse_arguments' in dir(aparse)
+    try:
+        aparse.does_not_exist
+    except AttributeError:
+        pass
+    else:
+        assert False, 'AttributeError was not raised'
@@ -0,0 +1,89 @@
+import io
+import os
+import sys
+import subprocess
+from argparse import ArgumentParser
+import aparse
+from aparse.manifest import build_manifest, write_manifest, answer_from_manifest
+
+
+def _write_program(path):
+    path.write_text('''
+from dataclasses import dataclass
+from aparse import ConditionalType, Literal, add_argparse_arguments
+
+
+@dataclass
+class A:
+    lr: float = 0.1
+
+
+@dataclass
+class B:
+    depth: int = 1
+    mode: Literal['x', 'y'] = 'x'
+
+
+class Model(ConditionalType, default='a'):
+    a: A
+    b: B
+
+
+@add_argparse_arguments
+def train(model: Model, k: int = 1, verbose: bool = False):
+    pass
+''')
+
+
+def _expected_help(train, args):
+    parser = train.add_argparse_arguments(ArgumentParser(prog='train.py'))
+    parser.parse_known_args(args)
+    return parser.format_help()
+
+
+def test_manifest_help(tmp_path, monkeypatch):
+    _write_program(tmp_path / 'manifest_program.py')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    from manifest_program import train
+
+    manifest = build_manifest(train, prog='train.py')
+    assert set(manifest['switches']) == {'--model'}
+    assert any(x.endswith('manifest_program.py') for x in manifest['sources'])
+
+    manifest_path = str(tmp_path / 'manifest.json')
+    write_manifest(train, manifest_path, prog='train.py', version='1.2')
+    for args in [['--help'], ['--model', 'b', '-h'], ['--model=a', '--help']]:
+        out = io.StringIO()
+        assert answer_from_manifest(manifest_path, args, file=out)
+        assert out.getvalue() == _expected_help(train, args[:-1])
+    assert '--model-depth' in _expected_help(train, ['--model', 'b'])
+
+    out = io.StringIO()
+    assert answer_from_manifest(manifest_path, ['--version'], file=out)
+    assert out.getvalue() == '1.2\n'
+
+    # The regular parser is used for other arguments and unknown selections
+    assert not answer_from_manifest(manifest_path, ['--k', '2'])
+    assert not answer_from_manifest(manifest_path, ['--model', 'c', '--help'])
+
+    # The manifest is out of date when the program changes
+    with open(tmp_path / 'manifest_program.py', 'a') as f:
+        f.write('\n# changed\n')
+    assert not answer_from_manifest(manifest_path, ['--help'])
+
+
+def test_manifest_does_not_import_program(tmp_path):
+    _write_program(tmp_path / 'manifest_program.py')
+    manifest_path = str(tmp_path / 'manifest.json')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), os.path.dirname(os.path.dirname(aparse.__file__))]))
+    subprocess.check_call(
+        [sys.executable, '-m', 'aparse.manifest', 'build', 'manifest_program:train', manifest_path, '--prog', 'train.py'],
+        env=env)
+    output = subprocess.check_output([sys.executable, '-c', '''
+import sys
+from aparse.manifest import answer_from_manifest
+assert answer_from_manifest(sys.argv[1], ['--model', 'b', '--help'])
+assert 'manifest_program' not in sys.modules
+assert 'aparse.argparse' not in sys.modules
+''', manifest_path], env=env)
+    assert b'--model-depth' in output
@@ -0,0 +1,136 @@
+import sys
+import pytest
+from typing import List
+from dataclasses import dataclass
+from aparse import ConditionalType, Literal, AllArguments, FunctionConditionalType
+from aparse.native import command
+
+
+@dataclass
+class D1:
+    prop: int = 1
+
+
+@dataclass
+class D2:
+    prop2: str = 'test'
+
+
+class DSwitch(ConditionalType):
+    d1: D1
+    d2: D2
+
+
+def test_native_parse_arguments():
+    @command
+    def testfn(k: int = 1, m: float = 2., name: str = 'a'):
+        return dict(k=k, m=m, name=name)
+
+    assert testfn(['--k', '3', '--m=5']) == dict(k=3, m=5., name='a')
+    assert testfn([], name='b') == dict(k=1, m=2., name='b')
+    assert testfn.parse_args(['--name', 'c']) == dict(k=1, m=2., name='c')
+
+
+def test_native_bool_arguments():
+    @command
+    def testfn(use_x: bool = False, y: bool = True):
+        return use_x, y
+
+    assert testfn([]) == (False, True)
+    assert testfn(['--use-x', '--no-y']) == (True, False)
+    assert testfn(['--no-x', '--y']) == (False, True)
+
+
+def test_native_nested_and_lists():
+    @dataclass
+    class D:
+        a: int
+        b: List[int] = None
+
+    @command
+    def testfn(d: D, all: AllArguments = None):
+        return d, all
+
+    d, all = testfn(['--d-a', '2', '--d-b', '1,2'])
+    assert d == D(2, [1, 2])
+    assert all == dict(d_a=2, d_b='1,2')
+
+
+def test_native_conditional_type():
+    @command
+    def testfn(k: DSwitch, x: int = 1):
+        return k, x
+
+    assert testfn(['--k', 'd1', '--k-prop', '5']) == (D1(5), 1)
+    assert testfn(['--k=d2', '--k-prop2=ok']) == (D2('ok'), 1)
+    # The runtime is not changed by the conditional arguments
+    assert 'k_prop' not in testfn.runtime._options
+
+
+def test_native_function_conditional_type():
+    @command
+    def testfn(k: FunctionConditionalType(lambda kwargs: D1 if kwargs.get('x') == '1' else D2), x: int = 1):
+        return k
+
+    assert testfn(['--x', '1', '--k-prop', '3']) == D1(3)
+    assert testfn(['--x', '2']) == D2('test')
+
+
+@pytest.mark.parametrize(('args', 'message'), [
+    (['--k', 'x'], "argument --k: invalid int value: 'x'"),
+    (['--c', 'z'], "argument --c: invalid choice: 'z' (choose from 'a', 'b')"),
+    (['--k'], 'argument --k: expected one argument'),
+    (['--zz', 'a'], 'unrecognized arguments: --zz a'),
+    (['--use-f=1'], "argument --use-f/--no-f: ignored explicit argument '1'"),
+])
+def test_native_errors(capsys, args, message):
+    @command(prog='prog')
+    def testfn(r: str = 'r', k: int = 1, c: Literal['a', 'b'] = 'a', use_f: bool = False):
+        pass
+
+    with pytest.raises(SystemExit) as e:
+        testfn(args)
+    assert e.value.code == 2
+    err = capsys.readouterr().err
+    assert err.startswith('usage: prog [-h]')
+    assert err.endswith(f'prog: error: {message}\n')
+
+
+def test_native_required_arguments(capsys):
+    @command(prog='prog')
+    def testfn(k: int, m: str):
+        pass
+
+    with pytest.raises(SystemExit):
+        testfn([])
+    assert 'prog: error: the following arguments are required: --k, --m' in capsys.readouterr().err
+
+
+def test_native_help(capsys):
+    @command(prog='prog')
+    def testfn(k: int, c: Literal['a', 'b'] = 'a'):
+        pass
+
+    with pytest.raises(SystemExit) as e:
+        testfn(['--help'])
+    assert e.value.code == 0
+    out = capsys.readouterr().out
+    assert out.startswith('usage: prog [-h] --k K [--c {a,b}]\n')
+    assert '--c {a,b}' in out
+    assert '[default: a]' in out
+    header = 'options:' if sys.version_info >= (3, 10) else 'optional arguments:'
+    assert f'\n\n{header}\n' in out
+
+
+def test_native_negated_flags_before_parse():
+    calls = []
+
+    def before_parse(parameters, runtime, kwargs):
+        calls.append(dict(kwargs))
+
+    @command(before_parse=before_parse)
+    def testfn(use_x: bool = True, y: bool = True):
+        return use_x, y
+
+    assert testfn(['--no-x', '--y']) == (False, True)
+    assert calls[-1] == dict(use_x=False, y=True)